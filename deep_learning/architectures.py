@@ -0,0 +1,48 @@
+"Classifier architectures shared by training, evaluation and the tracker"
+import torch.nn as nn
+from torchvision import models
+
+DEFAULT_ARCH = 'resnet50'
+
+
+def _replace_fc(network):
+    network.fc = head(network.fc.in_features)
+    return network
+
+
+def _replace_classifier(network):
+    last = len(network.classifier) - 1
+    network.classifier[last] = head(network.classifier[last].in_features)
+    return network
+
+
+# name -> (torchvision constructor, replaces its last layer with `head`)
+ARCHITECTURES = {
+    'resnet50': (models.resnet50, _replace_fc),
+    'resnet18': (models.resnet18, _replace_fc),
+    'mobilenet_v3_large': (models.mobilenet_v3_large, _replace_classifier),
+    'mobilenet_v3_small': (models.mobilenet_v3_small, _replace_classifier),
+    'efficientnet_b0': (models.efficientnet_b0, _replace_classifier),
+}
+
+
+def head(num_ftrs):
+    "Returns the drone probability head on `num_ftrs` features."
+    return nn.Sequential(nn.Linear(num_ftrs, 1), nn.Sigmoid())
+
+
+def create_network(arch=DEFAULT_ARCH, pretrained=True, constructor=None):
+    """Returns `arch` with the drone head.
+
+    `constructor` replaces the torchvision one, e.g. by its quantizable
+    counterpart.
+    """
+    default, replace_head = ARCHITECTURES[arch]
+    return replace_head((constructor or default)(pretrained=pretrained))
+
+
+def checkpoint_arch(state):
+    "Returns the architecture of a loaded checkpoint, older ones are resnet50."
+    if state is None:
+        return DEFAULT_ARCH
+    return state.get('arch', DEFAULT_ARCH)
@@ -148,9 +148,10 @@ def iterative_evaluate(network, loader):
             
     return {'predictions': predictions, 'ground_truth': ground_truth}
 
-def load_model(model_name, network, optimizer=None):
+def load_model(model_name, network, optimizer=None, state=None):
 
-    state = torch.load(model_name)
+    if state is None:
+        state = torch.load(model_name)
 
     network.load_state_dict(state['network_state'])
     if optimizer is not None:
@@ -165,7 +166,8 @@ def save_model(network, optimizer, epochs, args):
         'learning_rate:': args.lr,
         'network_state': network.state_dict(),
         'optimizer_state': optimizer.state_dict(),
-       'base': args.open
+       'base': args.open,
+       'arch': args.arch
     }
 
     file_name = args.basename + "_" + str(epochs) + ".pkl"
@@ -1,11 +1,11 @@
 import torch
-import torch.nn as nn
 from torch.autograd import Variable
-from torchvision import transforms, utils, models
+from torchvision import transforms, utils
 from torch.utils.data import DataLoader
 from sklearn.metrics import accuracy_score, precision_score, recall_score
 
 import dnn_functions as dnn
+from architectures import create_network, checkpoint_arch
 import argparse
 import os
 import time
@@ -33,23 +33,22 @@ val_stats = dnn.read_stats(args.dataloc + "val/stats")
 val_dataset = dnn.DroneDataset(root_dir=args.dataloc + "val/", transform=transforms.Compose([ dnn.Resize(224), dnn.Normalize(val_stats), dnn.ToTensor()]))
 val_loader = DataLoader(val_dataset, batch_size=args.batch, shuffle=True, num_workers=args.workers)
 
-network = models.resnet50(pretrained=True)
+model_name = args.open
+if model_name is None:
+    print("Enter a model name")
+    exit()
+
+state = torch.load(model_name)
+network = create_network(checkpoint_arch(state))
 
 #for param in network.parameters():
 #    param.requires_grad = False
 
-num_ftrs = network.fc.in_features
-network.fc = nn.Sequential(nn.Linear(num_ftrs, 1), nn.Sigmoid())
 network = torch.nn.DataParallel(network).to(device)
 
 print("Model created")
 
-model_name = args.open
-if model_name is None:
-    print("Enter a model name")
-    exit()
-    
-dnn.load_model(model_name, network)
+dnn.load_model(model_name, network, state=state)
 
 if args.batch == 1:
     results = dnn.iterative_evaluate(network, val_loader)
@@ -0,0 +1,90 @@
+import torch
+from torchvision import transforms
+from torchvision.models import quantization
+from torch.utils.data import DataLoader
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+
+import dnn_functions as dnn
+from architectures import create_network, checkpoint_arch
+import argparse
+import time
+
+# Post-training static quantization of the drone classifier. The int8 model
+# is saved as TorchScript, loadable with `main.py --runtime torchscript`.
+
+parser = argparse.ArgumentParser()
+parser.add_argument('open', help='Open the specified model for quantization')
+parser.add_argument('-o', '--output', default=None, help='TorchScript file of the quantized model. Default is <model>_int8.pt')
+parser.add_argument('-d', '--dataloc', default="datasets/", help='Path to the datasets')
+parser.add_argument('-b', '--batch', default=8, help='Specified batch size for calibration and testing', type=int)
+parser.add_argument('-c', '--calibration', default=20, help='Number of validation batches used for calibration', type=int)
+parser.add_argument('-w', '--workers', default=1, help='Number of workers for batch processing', type=int)
+parser.add_argument('-t', '--threads', default=1, help='Intra-op threads for the latency comparison', type=int)
+args = parser.parse_args()
+
+# quantized kernels only run on CPU, the fp32 reference runs there as well
+dnn.device = torch.device("cpu")
+torch.set_num_threads(args.threads)
+torch.backends.quantized.engine = 'fbgemm' if 'fbgemm' in torch.backends.quantized.supported_engines else 'qnnpack'
+
+val_stats = dnn.read_stats(args.dataloc + "val/stats")
+val_dataset = dnn.DroneDataset(root_dir=args.dataloc + "val/", transform=transforms.Compose([ dnn.Resize(224), dnn.Normalize(val_stats), dnn.ToTensor()]))
+val_loader = DataLoader(val_dataset, batch_size=args.batch, shuffle=True, num_workers=args.workers)
+
+state = torch.load(args.open, map_location='cpu')
+arch = checkpoint_arch(state)
+if not hasattr(quantization, arch):
+    print("No quantizable %s in torchvision" % arch)
+    exit()
+
+# fp32 reference, as in evaluate.py
+network = torch.nn.DataParallel(create_network(arch))
+dnn.load_model(args.open, network, state=state)
+network.eval()
+
+def quantizable(pretrained):
+    return getattr(quantization, arch)(pretrained=pretrained, quantize=False)
+
+# same weights in the quantizable model, which has quant/dequant stubs
+quantized = create_network(arch, pretrained=False, constructor=quantizable)
+quantized.load_state_dict(network.module.state_dict())
+quantized.eval()
+quantized.fuse_model()
+quantized.qconfig = torch.quantization.get_default_qconfig(torch.backends.quantized.engine)
+torch.quantization.prepare(quantized, inplace=True)
+
+print("Calibrating on %d batches" % args.calibration)
+with torch.no_grad():
+    for i, sample in enumerate(val_loader):
+        if i == args.calibration:
+            break
+        quantized(sample['image'])
+
+torch.quantization.convert(quantized, inplace=True)
+print("Model quantized")
+
+def latency(network):
+    image = torch.rand((1, 3, 224, 224))
+    with torch.no_grad():
+        network(image)
+        start = time.time()
+        for _ in range(10):
+            network(image)
+    return (time.time() - start) / 10
+
+results = {}
+for name, model in (('fp32', network), ('int8', quantized)):
+    evaluation = dnn.evaluate(model, val_loader)
+    results[name] = (accuracy_score(evaluation['ground_truth'], evaluation['predictions']),
+                     precision_score(evaluation['ground_truth'], evaluation['predictions']),
+                     recall_score(evaluation['ground_truth'], evaluation['predictions']),
+                     latency(model))
+
+for name, (accuracy, precision, recall, seconds) in results.items():
+    print('%s Acc: %.3f Prc: %.3f Rec: %.3f Latency: %.1f ms' % (name, accuracy, precision, recall, seconds * 1000))
+print('Speedup: %.2fx Acc loss: %.3f' % (results['fp32'][3] / results['int8'][3], results['fp32'][0] - results['int8'][0]))
+
+output = args.output or args.open.rsplit('.', 1)[0] + "_int8.pt"
+with torch.no_grad():
+    torch.jit.save(torch.jit.trace(quantized, torch.rand((1, 3, 224, 224))), output)
+print("Quantized model saved to %s" % output)
@@ -1,8 +1,9 @@
 import torch
 import torch.nn as nn
 import dnn_functions as dnn
+from architectures import ARCHITECTURES, create_network, checkpoint_arch
 import argparse
-from torchvision import transforms, utils, models
+from torchvision import transforms, utils
 from torch.utils.data import DataLoader
 from torch.optim import lr_scheduler
 from sklearn.metrics import accuracy_score, precision_score, recall_score
@@ -23,6 +24,7 @@ parser.add_argument('-L', '--logdir', default="training_logs/", help="Folder whe
 parser.add_argument('-r', '--saverate', default=5, help='The interval to save model states', type=int)
 parser.add_argument('-w', '--workers', default=4, help='Number of workers for batch processing', type=int)
 parser.add_argument('-n', '--notes', default="", help='Additional notes regarding the training')
+parser.add_argument('-a', '--arch', default=None, choices=sorted(ARCHITECTURES), help='Classifier architecture. Default is the one of the opened model, else resnet50')
 args = parser.parse_args()
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -35,13 +37,14 @@ train_loader = DataLoader(train_dataset, batch_size=args.batch, shuffle=True, nu
 val_dataset = dnn.DroneDataset(root_dir=args.dataloc + "val/", transform=transforms.Compose([ dnn.Resize(224), dnn.Normalize(val_stats), dnn.ToTensor()]))
 val_loader = DataLoader(val_dataset, batch_size=args.batch, shuffle=True, num_workers=args.workers)
 
-network = models.resnet50(pretrained=True)
+model_name = args.open
+state = torch.load(model_name) if model_name is not None else None
+args.arch = args.arch or checkpoint_arch(state)
+network = create_network(args.arch)
 
 #for param in network.parameters():
 #    param.requires_grad = False
 
-num_ftrs = network.fc.in_features
-network.fc = nn.Sequential(nn.Linear(num_ftrs, 1), nn.Sigmoid())
 network = torch.nn.DataParallel(network).to(device)
 
 #optimizer = torch.optim.Adam(network.parameters(), lr=args.lr)
@@ -51,9 +54,8 @@ criterion = nn.BCELoss()
 
 print("Model created")
 
-model_name = args.open
 if model_name is not None:
-    dnn.load_model(model_name, network) #, optimizer)
+    dnn.load_model(model_name, network, state=state) #, optimizer)
 
 ## Create log file
 timestamp = time.strftime("%d-%m-%Y_%H-%M-%S")
@@ -62,6 +64,7 @@ params = []
 params.append("Basename: " + args.basename)
 params.append("Data loc: " + args.dataloc)
 params.append("Opened model name: " + str(args.open))
+params.append("Architecture: " + args.arch)
 params.append("Learning rate: " + str(args.lr))
 params.append("Batch size: " + str(args.batch))
 params.append("Num. of Epochs: " + str(args.epochs))
@@ -0,0 +1,833 @@
+#! /usr/bin/env python3
+"Background models, detectors and candidate extraction for the detection state"
+import os
+import argparse
+import weakref
+from time import monotonic
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import cv2
+
+import visca
+
+# Candidate boxes: padded box, square crop for the classifier, area in pixels
+CANDIDATE_DTYPE = np.dtype([('box', '<i4', (4, )), ('crop', '<i4', (4, )),
+                            ('area', '<i4')])
+
+
+def extract_candidates(fgmask, area_threshold, padding_ratio, width, height):
+    """Returns candidates of the blobs in `fgmask` as CANDIDATE_DTYPE array.
+
+    Blobs are the 8-connected components of the mask, so the cost is one
+    pass over the mask however many blobs it holds.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(fgmask, connectivity=8)
+    stats = stats[1:]  # label 0 is the background
+    stats = stats[stats[:, cv2.CC_STAT_AREA] > area_threshold]
+    return make_candidates(stats[:, :4], padding_ratio, width, height,
+                           stats[:, cv2.CC_STAT_AREA])
+
+
+def make_candidates(rects, padding_ratio, width, height, areas=None):
+    """Pads `rects` (N x 4 of x, y, w, h) and expands them to square crops.
+
+    Rects are padded by `padding_ratio` of their size on every side, unless
+    the padded box would leave the frame. As in the original add_padding,
+    the right and bottom edges keep a margin of twice the padding. Crops
+    are squared around the padded box and shifted back inside the frame.
+    """
+    rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    x, y, w, h = rects.T
+    padx = (w * padding_ratio).astype(np.int64)
+    pady = (h * padding_ratio).astype(np.int64)
+    fits = ((x - padx >= 0) & (y - pady >= 0) &
+            (x + w + 2 * padx <= width) & (y + h + 2 * pady <= height))
+    x = np.where(fits, x - padx, x)
+    y = np.where(fits, y - pady, y)
+    w = np.where(fits, w + 2 * padx, w)
+    h = np.where(fits, h + 2 * pady, h)
+
+    # square crops, as utils.expand_bbox
+    diff = w - h
+    cx = np.where(diff < 0, np.maximum(0, x - (-diff) // 2), x)
+    cy = np.where(diff > 0, np.maximum(0, y - diff // 2), y)
+    cw = np.where(diff < 0, w - diff, w)
+    ch = np.where(diff > 0, h + diff, h)
+    cx = np.where((diff < 0) & (cx + cw > width), width - cw, cx)
+    cy = np.where((diff > 0) & (cy + ch > height), height - ch, cy)
+
+    candidates = np.zeros(len(rects), dtype=CANDIDATE_DTYPE)
+    candidates['box'] = np.column_stack((x, y, w, h))
+    candidates['crop'] = np.column_stack((cx, cy, cw, ch))
+    candidates['area'] = rects[:, 2] * rects[:, 3] if areas is None else areas
+    return candidates
+
+
+def merge_candidates(candidates, max_candidates, width, height):
+    """Merges overlapping candidates and keeps at most `max_candidates`.
+
+    Starting from the largest remaining blob, every candidate whose padded
+    box overlaps the growing cluster is absorbed into it. A cluster is
+    scored by the summed blob area of its members and the best clusters
+    are returned with crops recomputed for their union boxes.
+    """
+    if len(candidates) == 0:
+        return candidates
+    order = np.argsort(-candidates['area'], kind='stable')
+    boxes = candidates['box'][order].astype(np.int64)
+    x0, y0 = boxes[:, 0], boxes[:, 1]
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+    areas = candidates['area'][order]
+
+    free = np.ones(len(boxes), dtype=bool)
+    rects, scores = [], []
+    while free.any() and len(rects) < max_candidates:
+        seed = np.flatnonzero(free)[0]
+        members = np.zeros(len(boxes), dtype=bool)
+        members[seed] = True
+        box = [x0[seed], y0[seed], x1[seed], y1[seed]]
+        while True:
+            overlap = (free & ~members & (x0 < box[2]) & (x1 > box[0]) &
+                       (y0 < box[3]) & (y1 > box[1]))
+            if not overlap.any():
+                break
+            members |= overlap
+            box = [x0[members].min(), y0[members].min(),
+                   x1[members].max(), y1[members].max()]
+        free &= ~members
+        rects.append((box[0], box[1], box[2] - box[0], box[3] - box[1]))
+        scores.append(areas[members].sum())
+
+    merged = make_candidates(rects, 0, width, height, scores)
+    return merged[np.argsort(-merged['area'], kind='stable')]
+
+
+class CandidateAccumulator:
+    """Keeps candidates over a sliding window of the last `window` frames.
+
+    Candidates are associated with the tracks of the previous frames by the
+    distance of their centres, gated by the track box size. A track is
+    persistent once it was seen in `min_hits` frames of the window. Motion
+    consistency is the mean error of a constant velocity prediction of the
+    track, relative to its size.
+    """
+
+    def __init__(self, window=5, min_hits=3):
+        self.window = window
+        self.min_hits = min_hits
+        self.frame = 0
+        self.tracks = []
+
+    def update(self, candidates):
+        """Adds the candidates of a frame, returns the persistent ones.
+
+        Only tracks seen in this frame are returned, ranked by their
+        number of hits, then by motion consistency.
+        """
+        self.frame += 1
+        centres = (candidates['box'][:, :2] +
+                   candidates['box'][:, 2:] / 2).astype(np.float64)
+        free = np.ones(len(candidates), dtype=bool)
+
+        for track in self.tracks:
+            predicted = track['centre'] + track['velocity']
+            distance = np.linalg.norm(centres - predicted, axis=1)
+            gate = max(track['candidate']['box'][2:]) + 10
+            distance[~free | (distance > gate)] = np.inf
+            if len(distance) == 0 or not np.isfinite(distance.min()):
+                continue
+            i = int(np.argmin(distance))
+            free[i] = False
+            track['error'] += (distance[i] / gate - track['error']) / 2
+            track['velocity'] = centres[i] - track['centre']
+            track['centre'] = centres[i]
+            track['candidate'] = candidates[i]
+            track['hits'].append(self.frame)
+
+        for i in np.flatnonzero(free):
+            self.tracks.append(
+                dict(centre=centres[i], velocity=np.zeros(2), error=1.0,
+                     candidate=candidates[i], hits=[self.frame]))
+
+        # forget hits that left the window and tracks without any
+        first = self.frame - self.window + 1
+        for track in self.tracks:
+            track['hits'] = [f for f in track['hits'] if f >= first]
+        self.tracks = [t for t in self.tracks if t['hits']]
+
+        persistent = [
+            t for t in self.tracks
+            if len(t['hits']) >= self.min_hits and t['hits'][-1] == self.frame
+        ]
+        persistent.sort(key=lambda t: (-len(t['hits']), t['error']))
+        return np.array([t['candidate'] for t in persistent],
+                        dtype=CANDIDATE_DTYPE)
+
+    def reset(self):
+        self.frame = 0
+        self.tracks = []
+
+
+def downscale(frame, scale):
+    "Returns `frame` shrunk by `scale`, averaging the pixels."
+    return cv2.resize(frame, (0, 0), fx=scale, fy=scale,
+                      interpolation=cv2.INTER_AREA)
+
+
+def upscale(image, size, interpolation=cv2.INTER_NEAREST):
+    """Returns `image` resized to `size` (width, height).
+
+    The default interpolation keeps masks binary.
+    """
+    return cv2.resize(image, tuple(size), interpolation=interpolation)
+
+
+def find_contours(mask):
+    "Returns the external contours of the binary `mask`."
+    # contours are second to last in OpenCV 3 and 4 alike
+    return cv2.findContours(mask, cv2.RETR_EXTERNAL,
+                            cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+
+class PyramidBackground:
+    """KNN background model kept on a downscaled copy of the frame.
+
+    Candidates are found on the small foreground mask and then refined at
+    full resolution, only inside regions of interest around them, against
+    the upscaled background image.
+    """
+
+    def __init__(self, scale=0.25, kernel_size=5, margin=8, diff_threshold=30):
+        self.scale = scale
+        self.margin = margin  # full resolution pixels added around a ROI
+        self.diff_threshold = diff_threshold
+        self.model = cv2.createBackgroundSubtractorKNN(detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,
+                                                (kernel_size, kernel_size))
+        self.small_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,
+                                                      (3, 3))
+
+    def apply(self, frame, learningRate=-1):
+        """Updates the model and returns the dilated small foreground mask.
+
+        No median blur here, it would erase drones only a pixel or two wide
+        at this scale. Noise is removed by the refinement instead.
+        """
+        fgmask = self.model.apply(downscale(frame, self.scale),
+                                  learningRate=learningRate)
+        return cv2.dilate(fgmask, self.small_kernel, iterations=1)
+
+    def getBackgroundImage(self):
+        return self.model.getBackgroundImage()
+
+    def candidates(self, frame, fgmask, area_threshold):
+        """Returns full resolution boxes of the moving objects in `fgmask`.
+
+        `area_threshold` is in full resolution pixels.
+        """
+        height, width = frame.shape[:2]
+        contours = find_contours(fgmask)
+
+        background = None
+        boxes = []
+        for c in contours:
+            if background is None:
+                background = self.getBackgroundImage()
+
+            # region of interest at full resolution
+            x, y, w, h = cv2.boundingRect(c)
+            x0 = max(0, int(x / self.scale) - self.margin)
+            y0 = max(0, int(y / self.scale) - self.margin)
+            x1 = min(width, int((x + w) / self.scale) + self.margin)
+            y1 = min(height, int((y + h) / self.scale) + self.margin)
+
+            boxes += self.refine(frame, background, (x0, y0, x1, y1),
+                                 area_threshold)
+        return boxes
+
+    def refine(self, frame, background, roi, area_threshold):
+        """Returns boxes of the foreground inside `roi` at full resolution."""
+        x0, y0, x1, y1 = roi
+        bx0, by0 = int(x0 * self.scale), int(y0 * self.scale)
+        bx1 = max(bx0 + 1, int(np.ceil(x1 * self.scale)))
+        by1 = max(by0 + 1, int(np.ceil(y1 * self.scale)))
+
+        # background patch covering the roi, upscaled and aligned to it
+        patch = upscale(background[by0:by1, bx0:bx1],
+                        (int(round((bx1 - bx0) / self.scale)),
+                         int(round((by1 - by0) / self.scale))),
+                        interpolation=cv2.INTER_LINEAR)
+        ox = x0 - int(round(bx0 / self.scale))
+        oy = y0 - int(round(by0 / self.scale))
+        patch = patch[oy:oy + y1 - y0, ox:ox + x1 - x0]
+        roi_img = frame[y0:y0 + patch.shape[0], x0:x0 + patch.shape[1]]
+
+        diff = cv2.absdiff(roi_img, patch).max(axis=2)
+        _, mask = cv2.threshold(diff, self.diff_threshold, 255,
+                                cv2.THRESH_BINARY)
+        mask = cv2.medianBlur(mask, 3)
+        mask = cv2.dilate(mask, self.kernel, iterations=1)
+        contours = find_contours(mask)
+
+        boxes = []
+        for c in contours:
+            if cv2.contourArea(c) > area_threshold:
+                x, y, w, h = cv2.boundingRect(c)
+                boxes.append((x0 + x, y0 + y, w, h))
+        return boxes
+
+
+class MotionCompensatedBackground:
+    """Running average background that follows global camera motion.
+
+    The motion between consecutive frames is estimated as a similarity
+    transform from sparse optical flow on the downscaled grey frames. The
+    background is warped by it before every comparison, so a slowly panning
+    camera keeps its model. Pixels that just entered the view have no
+    background yet and never count as foreground.
+    """
+
+    def __init__(self, scale=0.5, alpha=0.2, diff_threshold=30,
+                 max_corners=200):
+        self.scale = scale
+        # background update rate, slower rates blur the background through
+        # the repeated warps
+        self.alpha = alpha
+        self.diff_threshold = diff_threshold
+        self.max_corners = max_corners
+        self.reset()
+
+    def reset(self):
+        self.background = None
+        self.valid = None  # pixels the background has seen
+        self.prev_gray = None
+
+    def global_motion(self, gray):
+        """Returns the 2x3 transform from the previous frame to `gray`."""
+        identity = np.float32([[1, 0, 0], [0, 1, 0]])
+        corners = cv2.goodFeaturesToTrack(self.prev_gray, self.max_corners,
+                                          0.01, 10)
+        if corners is None or len(corners) < 6:
+            return identity
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray,
+                                                    corners, None)
+        tracked = status.ravel() == 1
+        if tracked.sum() < 6:
+            return identity
+        transform, _ = cv2.estimateAffinePartial2D(corners[tracked],
+                                                   moved[tracked],
+                                                   method=cv2.RANSAC)
+        return identity if transform is None else transform.astype(np.float32)
+
+    def apply(self, frame, learningRate=-1):
+        """Updates the model and returns the full resolution foreground."""
+        small = downscale(frame, self.scale)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        rate = self.alpha if learningRate < 0 else learningRate
+
+        if self.background is None:
+            self.background = small.astype(np.float32)
+            self.valid = np.full((height, width), 255, dtype=np.uint8)
+            self.prev_gray = gray
+            return np.zeros(frame.shape[:2], dtype=np.uint8)
+
+        transform = self.global_motion(gray)
+        self.background = cv2.warpAffine(self.background, transform,
+                                         (width, height),
+                                         flags=cv2.INTER_LINEAR,
+                                         borderMode=cv2.BORDER_REPLICATE)
+        self.valid = cv2.warpAffine(self.valid, transform, (width, height),
+                                    flags=cv2.INTER_NEAREST)
+        self.prev_gray = gray
+
+        diff = cv2.absdiff(small.astype(np.float32), self.background)
+        fgmask = np.where((diff.max(axis=2) > self.diff_threshold) &
+                          (self.valid > 0), 255, 0).astype(np.uint8)
+
+        # new pixels take the frame as background, seen ones blend in
+        unseen = self.valid == 0
+        cv2.accumulateWeighted(small, self.background, rate)
+        self.background[unseen] = small[unseen]
+        self.valid[:] = 255
+
+        return upscale(fgmask, frame.shape[1::-1])
+
+    def getBackgroundImage(self):
+        if self.background is None:
+            return None
+        return self.background.astype(np.uint8)
+
+
+def _tile_worker(conn, frame_name, mask_name, shape, tile, core,
+                 kernel_size):
+    """Runs the background model of one tile in a worker process.
+
+    `tile` is the (x0, y0, x1, y1) slice the model sees, `core` the part of
+    it the worker owns in the shared mask. The overlap around the core keeps
+    the median and dilation free of border effects at the seams.
+    """
+    frame_shm = shared_memory.SharedMemory(name=frame_name)
+    mask_shm = shared_memory.SharedMemory(name=mask_name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=frame_shm.buf)
+    mask = np.ndarray(shape[:2], dtype=np.uint8, buffer=mask_shm.buf)
+
+    cv2.setNumThreads(1)
+    model = cv2.createBackgroundSubtractorKNN(detectShadows=False)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,
+                                       (kernel_size, kernel_size))
+    x0, y0, x1, y1 = tile
+    cx0, cy0, cx1, cy1 = core
+
+    while True:
+        command, learningRate = conn.recv()
+        if command == 'stop':
+            break
+        if command == 'reset':
+            model = cv2.createBackgroundSubtractorKNN(detectShadows=False)
+        elif command == 'background':
+            # handed back through the frame buffer
+            background = model.getBackgroundImage()
+            frame[cy0:cy1, cx0:cx1] = background[cy0 - y0:cy1 - y0,
+                                                 cx0 - x0:cx1 - x0]
+        else:
+            fgmask = model.apply(frame[y0:y1, x0:x1],
+                                 learningRate=learningRate)
+            fgmask = cv2.medianBlur(fgmask, 3)
+            fgmask = cv2.dilate(fgmask, kernel, iterations=1)
+            mask[cy0:cy1, cx0:cx1] = fgmask[cy0 - y0:cy1 - y0,
+                                            cx0 - x0:cx1 - x0]
+        conn.send(True)
+
+    del frame, mask
+    frame_shm.close()
+    mask_shm.close()
+
+
+def _stop_tiles(conns, processes, segments):
+    "Stops the tile workers and frees their shared memory."
+    for conn in conns:
+        try:
+            conn.send(('stop', None))
+        except OSError:
+            pass  # worker already gone
+    for process in processes:
+        process.join(timeout=1.0)
+    for segment in segments:
+        segment.unlink()
+        try:
+            segment.close()
+        except BufferError:
+            pass  # still viewed by an array, unmapped once that is freed
+
+
+class TiledBackground:
+    """KNN background model split over overlapping tiles.
+
+    Every tile is modelled by its own worker process. Frames are handed over
+    through shared memory and the workers write the median filtered, dilated
+    foreground of their tile into one shared full resolution mask, so
+    contours crossing a seam are found whole by the caller.
+
+    Workers are spawned rather than forked, as the tracker already runs
+    threads when the model is created. The shared memory is freed by
+    `close`, or at the latest on garbage collection or interpreter exit.
+    """
+
+    def __init__(self, workers, width=1920, height=1080, overlap=16,
+                 kernel_size=5):
+        self.shape = (height, width, 3)
+        self.__frame_shm = shared_memory.SharedMemory(
+            create=True, size=int(np.prod(self.shape)))
+        self.__mask_shm = shared_memory.SharedMemory(create=True,
+                                                     size=width * height)
+        self.__frame = np.ndarray(self.shape, dtype=np.uint8,
+                                  buffer=self.__frame_shm.buf)
+        self.__mask = np.ndarray(self.shape[:2], dtype=np.uint8,
+                                 buffer=self.__mask_shm.buf)
+
+        self.__conns = []
+        self.__processes = []
+        self.__finalizer = weakref.finalize(
+            self, _stop_tiles, self.__conns, self.__processes,
+            (self.__frame_shm, self.__mask_shm))
+
+        context = multiprocessing.get_context('spawn')
+        for tile, core in self.tiles(workers, width, height, overlap):
+            conn, child = context.Pipe()
+            process = context.Process(target=_tile_worker,
+                              args=(child, self.__frame_shm.name,
+                                    self.__mask_shm.name, self.shape, tile,
+                                    core, kernel_size),
+                              daemon=True)
+            process.start()
+            self.__conns.append(conn)
+            self.__processes.append(process)
+
+    @staticmethod
+    def tiles(count, width, height, overlap):
+        """Returns (tile, core) boxes of a grid of `count` tiles.
+
+        The grid is as square as `count` allows, cores cover the frame
+        without overlap and tiles extend them by `overlap` pixels.
+        """
+        rows = max(r for r in range(1, int(np.sqrt(count)) + 1)
+                   if count % r == 0)
+        cols = count // rows
+        xs = np.linspace(0, width, cols + 1).astype(int).tolist()
+        ys = np.linspace(0, height, rows + 1).astype(int).tolist()
+
+        boxes = []
+        for r in range(rows):
+            for c in range(cols):
+                core = (xs[c], ys[r], xs[c + 1], ys[r + 1])
+                tile = (max(0, core[0] - overlap), max(0, core[1] - overlap),
+                        min(width, core[2] + overlap),
+                        min(height, core[3] + overlap))
+                boxes.append((tile, core))
+        return boxes
+
+    def __command(self, command, learningRate=-1):
+        for conn in self.__conns:
+            conn.send((command, learningRate))
+        for conn in self.__conns:
+            conn.recv()
+
+    def apply(self, frame, learningRate=-1):
+        """Updates all tiles and returns the merged foreground mask.
+
+        The mask is already median filtered and dilated. It is overwritten
+        by the next call.
+        """
+        self.__frame[:] = frame
+        self.__command('apply', learningRate)
+        return self.__mask
+
+    def getBackgroundImage(self):
+        self.__command('background')
+        return self.__frame.copy()
+
+    def reset(self):
+        """Forgets the background, the workers are kept running."""
+        self.__command('reset')
+
+    def close(self):
+        del self.__frame, self.__mask
+        self.__finalizer()
+
+
+class BackgroundCache:
+    """Background images of the poses the camera searched from.
+
+    Poses are quantized so that returning to a search position finds its
+    entry again. A fresh model is seeded with the cached image and only
+    needs a few live frames to refresh. With `directory` set, images are
+    also kept on disk as png and reused by later runs.
+    """
+
+    def __init__(self, directory=None, pan_step=32, tilt_step=32,
+                 zoom_step=512, seed_frames=5):
+        self.directory = directory
+        self.steps = (pan_step, tilt_step, zoom_step)
+        self.seed_frames = seed_frames
+        self.images = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, pose):
+        pan, tilt, zoom = [int(v) for v in pose]
+        # signed pan and tilt, so poses around home share their key
+        pan, tilt = visca.to_signed(pan), visca.to_signed(tilt)
+        return tuple(int(round(v / s))
+                     for v, s in zip((pan, tilt, zoom), self.steps))
+
+    def filename(self, key):
+        return os.path.join(self.directory, 'bg_%d_%d_%d.png' % key)
+
+    def get(self, pose):
+        """Returns the background image of `pose`, None if unknown."""
+        key = self.key(pose)
+        if key not in self.images and self.directory is not None:
+            image = cv2.imread(self.filename(key))
+            if image is not None:
+                self.images[key] = image
+        return self.images.get(key)
+
+    def store(self, pose, model, size):
+        """Keeps the background of `model` at full resolution `size`."""
+        image = model.getBackgroundImage()
+        if image is None:
+            return
+        if image.shape[1::-1] != tuple(size):
+            image = upscale(image, size, interpolation=cv2.INTER_LINEAR)
+        key = self.key(pose)
+        self.images[key] = image
+        if self.directory is not None:
+            cv2.imwrite(self.filename(key), image)
+
+    def seed(self, model, image):
+        """Teaches `model` the cached background without live frames."""
+        for _ in range(self.seed_frames):
+            model.apply(image)
+
+
+class FrameDifference:
+    """Foreground as the change to the previous frame, no model at all."""
+
+    def __init__(self, diff_threshold=25):
+        self.diff_threshold = diff_threshold
+        self.previous = None
+
+    def apply(self, frame, learningRate=-1):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.previous is None:
+            self.previous = gray
+        diff = cv2.absdiff(gray, self.previous)
+        self.previous = gray
+        _, fgmask = cv2.threshold(diff, self.diff_threshold, 255,
+                                  cv2.THRESH_BINARY)
+        return fgmask
+
+    def getBackgroundImage(self):
+        if self.previous is None:
+            return None
+        return cv2.cvtColor(self.previous, cv2.COLOR_GRAY2BGR)
+
+
+class Detector:
+    """Finds candidates of moving objects in frames with a background model.
+
+    `apply` only updates the model, e.g. while it is warmed up, `detect`
+    updates it and returns the foreground mask with the candidates found in
+    it. Backends differ in the model and may filter the mask or find the
+    candidates themselves. Each backend defines `create_model`, returning a
+    fresh model with `apply` and `getBackgroundImage` like OpenCV's
+    background subtractors.
+    """
+    # True if the model follows camera motion, so the camera may sweep
+    follows_camera = False
+
+    def __init__(self, width=1920, height=1080, kernel_size=5,
+                 padding_ratio=0.1, area_threshold=100):
+        self.width = width
+        self.height = height
+        self.padding_ratio = padding_ratio
+        self.area_threshold = area_threshold
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,
+                                                (kernel_size, kernel_size))
+        self.model = None
+
+    def reset(self):
+        """Starts over with an empty background model."""
+        self.model = self.create_model()
+
+    def apply(self, frame, learningRate=-1):
+        if self.model is None:
+            self.reset()
+        return self.model.apply(frame, learningRate=learningRate)
+
+    def getBackgroundImage(self):
+        return self.model.getBackgroundImage()
+
+    def foreground(self, frame):
+        fgmask = self.apply(frame)
+        fgmask = cv2.medianBlur(fgmask, 3)
+        return cv2.dilate(fgmask, self.kernel, iterations=1)
+
+    def detect(self, frame):
+        """Returns the foreground mask and CANDIDATE_DTYPE candidates."""
+        fgmask = self.foreground(frame)
+        return fgmask, extract_candidates(fgmask, self.area_threshold,
+                                          self.padding_ratio, self.width,
+                                          self.height)
+
+    def close(self):
+        pass
+
+
+class KNNDetector(Detector):
+    def create_model(self):
+        return cv2.createBackgroundSubtractorKNN(detectShadows=False)
+
+
+class MOG2Detector(Detector):
+    def create_model(self):
+        return cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+
+
+class FrameDifferenceDetector(Detector):
+    def create_model(self):
+        return FrameDifference()
+
+
+class PyramidDetector(Detector):
+    def __init__(self, scale=0.25, **kwargs):
+        super().__init__(**kwargs)
+        self.scale = scale
+
+    def create_model(self):
+        return PyramidBackground(scale=self.scale)
+
+    def detect(self, frame):
+        # candidates on the downscaled mask, refined at full resolution
+        fgmask = self.apply(frame)
+        rects = self.model.candidates(frame, fgmask, self.area_threshold)
+        candidates = make_candidates(rects, self.padding_ratio, self.width,
+                                     self.height)
+        fgmask = upscale(fgmask, (self.width, self.height))
+        return fgmask, candidates
+
+
+class TiledDetector(Detector):
+    def __init__(self, workers=4, **kwargs):
+        super().__init__(**kwargs)
+        self.workers = workers
+
+    def reset(self):
+        # the worker processes are kept, only their models start over
+        if self.model is None:
+            self.model = TiledBackground(self.workers, self.width,
+                                         self.height)
+        else:
+            self.model.reset()
+
+    def foreground(self, frame):
+        return self.apply(frame)  # tile workers filter their own part
+
+    def close(self):
+        if self.model is not None:
+            self.model.close()
+            self.model = None
+
+
+class MotionDetector(Detector):
+    follows_camera = True
+
+    def __init__(self, scale=0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.scale = scale
+
+    def create_model(self):
+        return MotionCompensatedBackground(scale=self.scale)
+
+
+DETECTORS = {
+    'knn': KNNDetector,
+    'mog2': MOG2Detector,
+    'diff': FrameDifferenceDetector,
+    'pyramid': PyramidDetector,
+    'tiled': TiledDetector,
+    'motion': MotionDetector,
+}
+
+
+def create_detector(name, width=1920, height=1080, **options):
+    """Returns detector `name` of DETECTORS. Options not taken by it, e.g.
+    the scale of a full resolution backend, are ignored."""
+    cls = DETECTORS[name]
+    if 'scale' in options and cls not in (PyramidDetector, MotionDetector):
+        del options['scale']
+    if 'workers' in options and cls is not TiledDetector:
+        del options['workers']
+    return cls(width=width, height=height, **options)
+
+
+def benchmark(detector, flight, warmup=60, max_candidates=8):
+    """Runs `detector` over the (row, frame) pairs of a recorded flight.
+
+    The first `warmup` frames only train the model. Recall counts the
+    logged bboxes overlapped by a candidate. Only frames logged while
+    tracking carry a bbox, so it is recall with the camera following the
+    target, not on a static camera. Returns frames per second, recall and
+    candidates per frame.
+    """
+    detector.reset()
+    elapsed, count, hits, targets, total = 0.0, 0, 0, 0, 0
+    for i, (row, frame) in enumerate(flight):
+        if i < warmup:
+            detector.apply(frame)
+            continue
+
+        start = monotonic()
+        _, candidates = detector.detect(frame)
+        candidates = merge_candidates(candidates, max_candidates,
+                                      detector.width, detector.height)
+        elapsed += monotonic() - start
+        count += 1
+        total += len(candidates)
+
+        x, y, w, h = row[5:9]
+        if w > 0 and h > 0:
+            targets += 1
+            boxes = candidates['box']
+            hits += bool(np.any((boxes[:, 0] < x + w) & (boxes[:, 1] < y + h)
+                                & (boxes[:, 0] + boxes[:, 2] > x) &
+                                (boxes[:, 1] + boxes[:, 3] > y)))
+
+    return (count / elapsed if elapsed else 0.0,
+            hits / targets if targets else float('nan'),
+            total / count if count else 0.0)
+
+
+def flight_frames(video_file, rows):
+    """Yields logged `rows` with their frames, by the index sidecar if any.
+
+    Rows whose frame was dropped from the video are skipped.
+    """
+    from flight_log import IndexedVideo, index_filename
+
+    if os.path.exists(index_filename(video_file)):
+        video = IndexedVideo(video_file)
+        for row in rows:
+            frame = video.frame(row[0])
+            if frame is not None:
+                yield row, frame
+    else:
+        video = cv2.VideoCapture(video_file)
+        for row in rows:
+            valid, frame = video.read()
+            if not valid:
+                break
+            yield row, frame
+    video.release()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('log', help='Flight log (.log or .bin next to its .avi)')
+parser.add_argument('--video', default=None, help='Default is <log>.avi')
+parser.add_argument('-d',
+                    '--detectors',
+                    nargs='+',
+                    default=sorted(DETECTORS),
+                    choices=sorted(DETECTORS),
+                    help='Detectors to benchmark')
+parser.add_argument('--scale', default=None, type=float)
+parser.add_argument('--workers', default=4, type=int)
+parser.add_argument('--warmup', default=60, type=int)
+
+if __name__ == "__main__":
+    from flight_log import read_rows
+
+    args = parser.parse_args()
+    video_file = args.video or os.path.splitext(args.log)[0] + '.avi'
+    rows = read_rows(args.log)
+    capture = cv2.VideoCapture(video_file)
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    capture.release()
+
+    options = dict(workers=args.workers)
+    if args.scale is not None:
+        options['scale'] = args.scale
+
+    print('%-8s %8s %12s %12s' %
+          ('detector', 'fps', 'track recall', 'cand/frame'))
+    for name in args.detectors:
+        detector = create_detector(name, *size, **options)
+        fps, recall, per_frame = benchmark(detector,
+                                           flight_frames(video_file, rows),
+                                           args.warmup)
+        detector.close()
+        print('%-8s %8.1f %12.3f %12.2f' % (name, fps, recall, per_frame))
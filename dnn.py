@@ -1,4 +1,5 @@
 "Provides support to convert, transform and classify images"
+from abc import ABC, abstractmethod
 from time import time
 import csv
 
@@ -6,26 +7,28 @@ import numpy as np
 import cv2
 import torch
 import torch.nn as nn
-from torchvision import models
 from fastai.vision import *
 
+from deep_learning.architectures import create_network, checkpoint_arch
+
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
-def initialize_net(model_path):
-    "Returns pytorch CNN."
-    network = models.resnet50(pretrained=True)
+def initialize_net(model_path, warmup=True):
+    "Returns pytorch CNN of the architecture stored in the checkpoint."
+    state = torch.load(model_path) if model_path is not None else None
+    network = create_network(checkpoint_arch(state))
     for param in network.parameters():
         param.requires_grad = False
 
-    num_ftrs = network.fc.in_features
-    network.fc = nn.Sequential(nn.Linear(num_ftrs, 1), nn.Sigmoid())
     network = nn.DataParallel(network).to(device)
 
-    if model_path is not None:
-        load_model(model_path, network)
+    if state is not None:
+        load_model(model_path, network, state=state)
 
     network.eval()
+    if not warmup:
+        return network
 
     # Run random sequences to initialize bigger chunk of the memory
     placeholder = torch.rand((400, 3, 224, 224)).to(device)
@@ -37,6 +40,90 @@ def initialize_net(model_path):
     return network
 
 
+RUNTIMES = ['eager', 'torchscript', 'onnx']
+
+
+def initialize_runtime(runtime, model_path, batch_size=8, threads=None):
+    """Returns the classifier of `runtime`, called like the pytorch CNN.
+
+    `eager` loads a `load_model` checkpoint, the other runtimes load the
+    file written by export.py (or quantize.py for torchscript). Those run
+    any number of images, split into batches of at most `batch_size`, with
+    `threads` intra-op threads.
+    """
+    if runtime == 'eager':
+        return initialize_net(model_path)
+    if runtime == 'torchscript':
+        return TorchScriptEngine(model_path, batch_size, threads)
+    if runtime == 'onnx':
+        return OnnxEngine(model_path, batch_size, threads)
+    raise ValueError("Unknown runtime %s" % runtime)
+
+
+class BatchEngine(ABC):
+    """Runs batches through an exported model, at most `batch_size` images
+    at a time."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    @abstractmethod
+    def run(self, batch):
+        "Returns the probabilities of one batch."
+
+    def __call__(self, images):
+        return torch.cat([
+            self.run(images[start:start + self.batch_size])
+            for start in range(0, len(images), self.batch_size)
+        ])
+
+
+class TorchScriptEngine(BatchEngine):
+    "Frozen TorchScript classifier, int8 models stay on the CPU."
+
+    def __init__(self, model_path, batch_size=8, threads=None):
+        super().__init__(batch_size)
+        if threads is not None:
+            torch.set_num_threads(threads)
+        self.module = torch.jit.load(model_path, map_location='cpu')
+        self.module.eval()
+
+        # quantized kernels only exist for the CPU
+        quantized = 'quantized::' in str(self.module.inlined_graph)
+        self.device = torch.device('cpu') if quantized else device
+        self.module.to(self.device)
+        for size in (1, batch_size):  # let the profiling executor specialize
+            self(torch.zeros((size, 3, 224, 224)))
+
+    def run(self, batch):
+        with torch.no_grad():
+            return self.module(batch.to(self.device))
+
+
+class OnnxEngine(BatchEngine):
+    "ONNX Runtime session of the exported classifier."
+
+    def __init__(self, model_path, batch_size=8, threads=None):
+        import onnxruntime
+
+        super().__init__(batch_size)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = \
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads is not None:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path,
+            options,
+            providers=onnxruntime.get_available_providers())
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        output, = self.session.run(None,
+                                   {self.input_name: batch.cpu().numpy()})
+        return torch.from_numpy(output)
+
+
 def initialize_net_fastai(model_folder_path, model_file_name='export.pkl'):
     "Returns fastai learner."
     return load_learner(model_folder_path, fname=model_file_name)
@@ -83,9 +170,13 @@ def real_time_evaluate_fastai(network, data):
     return results
 
 
-def load_model(model_name, network, optimizer=None):
-    "Loads model at `model_name` into `network` (optional optimizer change)."
-    state = torch.load(model_name)
+def load_model(model_name, network, optimizer=None, state=None):
+    """Loads model at `model_name` into `network` (optional optimizer change).
+
+    `state` is the checkpoint if it was already loaded.
+    """
+    if state is None:
+        state = torch.load(model_name)
 
     network.load_state_dict(state['network_state'])
     if optimizer is not None:
@@ -100,13 +191,14 @@ class Normalize(object):
 
     def __init__(self, stats):
         self.stats = stats
+        self.img_mean = np.asarray(stats["img_mean"],
+                                   dtype=float).reshape(1, 1, 3)
+        self.img_std = np.asarray(stats["img_std"],
+                                  dtype=float).reshape(1, 1, 3)
 
     def __call__(self, image):
-        img_mean = np.asarray(self.stats["img_mean"],
-                              dtype=float).reshape(1, 1, 3)
-        img_std = np.asarray(self.stats["img_std"],
-                             dtype=float).reshape(1, 1, 3)
-        norm_image = (np.asarray(image, dtype=float) - img_mean) / img_std
+        norm_image = (np.asarray(image, dtype=float) -
+                      self.img_mean) / self.img_std
 
         return norm_image
 
@@ -135,3 +227,45 @@ class ToTensor(object):
     def __call__(self, sample):
         image = sample.transpose((2, 0, 1))
         return torch.tensor(image, dtype=torch.float).unsqueeze(0)
+
+
+class BatchPreprocessor(object):
+    """Resizes, normalizes and stacks images into one float32 NCHW tensor.
+
+    Images are resized into a preallocated uint8 batch, which is converted,
+    transposed and normalized in one pass into a preallocated tensor. The
+    returned tensor is overwritten by the next call.
+    """
+
+    def __init__(self, stats, size=224, capacity=16):
+        self.size = size
+        std = np.asarray(stats["img_std"], dtype=np.float32)
+        mean = np.asarray(stats["img_mean"], dtype=np.float32)
+        # (x - mean) / std as x * scale + shift
+        self.scale = torch.from_numpy(1 / std).reshape(1, 3, 1, 1)
+        self.shift = torch.from_numpy(-mean / std).reshape(1, 3, 1, 1)
+        self.__allocate(capacity)
+
+    def __allocate(self, capacity):
+        self.capacity = capacity
+        self.images = np.empty((capacity, self.size, self.size, 3),
+                               dtype=np.uint8)
+        self.batch = torch.empty((capacity, 3, self.size, self.size),
+                                 dtype=torch.float)
+
+    def __call__(self, images):
+        count = len(images)
+        if count > self.capacity:
+            self.__allocate(max(count, 2 * self.capacity))
+
+        for image, resized in zip(images, self.images):
+            if self.size > image.shape[0]:
+                interpolation = cv2.INTER_CUBIC
+            else:
+                interpolation = cv2.INTER_AREA
+            cv2.resize(image, (self.size, self.size), dst=resized,
+                       interpolation=interpolation)
+
+        batch = self.batch[:count]
+        batch.copy_(torch.from_numpy(self.images[:count]).permute(0, 3, 1, 2))
+        return torch.addcmul(self.shift, batch, self.scale, out=batch)
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+"Exports the drone classifier to TorchScript and ONNX and benchmarks runtimes"
+import os
+import argparse
+from time import monotonic
+
+import torch
+
+from dnn import initialize_net, initialize_runtime, real_time_evaluate
+
+
+def export_torchscript(network, filename, batch_size=8):
+    "Traces `network` on 3x224x224 images and saves it frozen."
+    example = torch.rand((batch_size, 3, 224, 224))
+    with torch.no_grad():
+        module = torch.jit.trace(network, example)
+        module = torch.jit.freeze(module)
+    module.save(filename)
+
+
+def export_onnx(network, filename, batch_size=8):
+    "Saves `network` as ONNX graph of 3x224x224 images, any batch size."
+    example = torch.rand((batch_size, 3, 224, 224))
+    with torch.no_grad():
+        torch.onnx.export(network,
+                          example,
+                          filename,
+                          input_names=['images'],
+                          output_names=['probs'],
+                          dynamic_axes={
+                              'images': {
+                                  0: 'batch'
+                              },
+                              'probs': {
+                                  0: 'batch'
+                              }
+                          })
+
+
+def benchmark(network, batch_sizes, repeats=20):
+    "Returns mean seconds per batch for each batch size."
+    latencies = {}
+    for batch_size in batch_sizes:
+        images = torch.rand((batch_size, 3, 224, 224))
+        real_time_evaluate(network, images)  # warm up
+        start = monotonic()
+        for _ in range(repeats):
+            real_time_evaluate(network, images)
+        latencies[batch_size] = (monotonic() - start) / repeats
+    return latencies
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('model', help='Checkpoint written by save_model')
+parser.add_argument('-o',
+                    '--output',
+                    default=None,
+                    help='Output path without extension, .pt and .onnx are '
+                    'appended. Default is the checkpoint path')
+parser.add_argument('--batch-size',
+                    default=8,
+                    type=int,
+                    help='Batch size the models are traced with and the '
+                    'largest batch the benchmarked runtimes run at once')
+parser.add_argument('--threads',
+                    default=None,
+                    type=int,
+                    help='Intra-op threads of the benchmarked runtimes')
+parser.add_argument('--bench',
+                    nargs='*',
+                    type=int,
+                    default=None,
+                    metavar='BATCH_SIZE',
+                    help='Compare latency of eager, TorchScript and ONNX '
+                    'inference at these batch sizes, default 1 2 4 8')
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.model)[0]
+
+    # exported without the DataParallel wrapper
+    network = initialize_net(args.model, warmup=False).module.cpu()
+    export_torchscript(network, output + '.pt', args.batch_size)
+    print("Exported %s.pt" % output)
+    try:
+        export_onnx(network, output + '.onnx', args.batch_size)
+        print("Exported %s.onnx" % output)
+    except Exception as e:
+        print("ONNX export failed:", e)
+
+    if args.bench is not None:
+        batch_sizes = args.bench or [1, 2, 4, 8]
+        runtimes = {'eager': initialize_net(args.model, warmup=False)}
+        for runtime, extension in (('torchscript', '.pt'), ('onnx', '.onnx')):
+            try:
+                runtimes[runtime] = initialize_runtime(runtime,
+                                                       output + extension,
+                                                       args.batch_size,
+                                                       args.threads)
+            except (ImportError, RuntimeError, OSError) as e:
+                print("Skipping %s: %s" % (runtime, e))
+
+        print('%-12s' % 'batch' + ''.join('%10d' % b for b in batch_sizes))
+        for runtime, network in runtimes.items():
+            latencies = benchmark(network, batch_sizes)
+            print('%-12s' % runtime + ''.join('%8.1fms' % (latencies[b] * 1000)
+                                              for b in batch_sizes))
@@ -0,0 +1,202 @@
+#! /usr/bin/env python3
+"Compact binary flight log, video frame index and their readers"
+import os
+import struct
+import argparse
+
+import numpy as np
+import cv2
+
+MAGIC = b'PTZLOG01'
+HEADER = struct.Struct('<8sQ')  # magic, number of records
+RECORD = struct.Struct('<IdHHHiiiiBf')
+RECORD_DTYPE = np.dtype([('frame_no', '<u4'), ('time', '<f8'),
+                         ('pan', '<u2'), ('tilt', '<u2'), ('zoom', '<u2'),
+                         ('x', '<i4'), ('y', '<i4'), ('w', '<i4'),
+                         ('h', '<i4'), ('state', 'u1'), ('score', '<f4')])
+STATES = ['search', 'detect', 'id', 'track']
+NO_STATE = 255
+
+CSV_HEADER = "frame_no,time,cam_pan,cam_tilt,cam_zoom,x,y,w,h,state,score\n"
+
+# Video index sidecar (.idx): frame_no and position of the frame in the video
+INDEX_RECORD = struct.Struct('<qq')
+INDEX_DTYPE = np.dtype([('frame_no', '<i8'), ('video_pos', '<i8')])
+
+
+class BinaryFlightLog:
+    """Appends fixed-width records to a preallocated file.
+
+    The file holds room for `capacity` records and doubles when full. The
+    record count in the header is updated on `flush` and `close`.
+    """
+
+    def __init__(self, filename, capacity=108000):
+        self.filename = filename
+        self.capacity = capacity
+        self.count = 0
+        self.file = open(filename, 'w+b')
+        self.file.write(HEADER.pack(MAGIC, 0))
+        self.__allocate()
+
+    def __allocate(self):
+        size = HEADER.size + self.capacity * RECORD.size
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(self.file.fileno(), 0, size)
+        else:
+            self.file.truncate(size)
+
+    def append(self, frame_no, time, telemetry, bbox, state, score):
+        """Appends one record. `time` is in seconds, `bbox` may be None."""
+        if self.count == self.capacity:
+            self.capacity *= 2
+            self.__allocate()
+
+        x, y, w, h = [int(i) for i in bbox] if bbox is not None else (-1, ) * 4
+        state = STATES.index(state) if state in STATES else NO_STATE
+        self.file.write(
+            RECORD.pack(frame_no, time, *telemetry, x, y, w, h, state, score))
+        self.count += 1
+
+    def flush(self):
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.count))
+        self.file.seek(HEADER.size + self.count * RECORD.size)
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.truncate(HEADER.size + self.count * RECORD.size)
+        self.file.close()
+
+
+def read_flight_log(filename):
+    """Returns the records of a binary flight log as read-only memmap.
+
+    Records past the header count that were written before a crash are
+    recovered, unwritten (zero) records at the end are cut off.
+    """
+    with open(filename, 'rb') as f:
+        magic, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("%s is not a binary flight log" % filename)
+
+    available = (os.path.getsize(filename) - HEADER.size) // RECORD.size
+    if available == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    records = np.memmap(filename, dtype=RECORD_DTYPE, mode='r',
+                        offset=HEADER.size, shape=(available, ))
+    if count < available:
+        written = np.flatnonzero(records['frame_no'])
+        count = max(count, written[-1] + 1 if len(written) else 0)
+    return records[:count]
+
+
+def read_rows(filename):
+    """Returns rows of a `Logger` csv or binary log as int array.
+
+    Columns are frame_no, time, cam_pan, cam_tilt, cam_zoom, x, y, w, h with
+    time in milliseconds.
+    """
+    if filename.endswith('.bin'):
+        records = read_flight_log(filename)
+        time_ms = np.round((records['time'] - records['time'][:1]) * 1000)
+        return np.column_stack([
+            records['frame_no'], time_ms, records['pan'], records['tilt'],
+            records['zoom'], records['x'], records['y'], records['w'],
+            records['h']
+        ]).astype(np.int64)
+
+    return np.loadtxt(filename, delimiter=',', skiprows=1, dtype=np.int64,
+                      usecols=range(9), ndmin=2)
+
+
+def export_csv(filename, output):
+    """Writes binary flight log `filename` as csv to `output`.
+
+    The first nine columns match the text log written by `Logger`, with time
+    in milliseconds since the first record.
+    """
+    records = read_flight_log(filename)
+    start = records['time'][0] if len(records) else 0.0
+    names = STATES + ['none'] * (NO_STATE + 1 - len(STATES))
+
+    with open(output, 'w') as f:
+        f.write(CSV_HEADER)
+        for r in records:
+            f.write("%d,%d,%d,%d,%d,%d,%d,%d,%d,%s,%.3f\n" %
+                    (r['frame_no'], int(round((r['time'] - start) * 1000)),
+                     r['pan'], r['tilt'], r['zoom'], r['x'], r['y'], r['w'],
+                     r['h'], names[r['state']], r['score']))
+
+
+def index_filename(video_file):
+    return os.path.splitext(video_file)[0] + '.idx'
+
+
+class IndexedVideo:
+    """Random access to the frames of a logged video by log `frame_no`.
+
+    The index sidecar written by `Logger` maps every logged frame_no to the
+    position of its frame in the video, so frames of dropped rows are never
+    confused with their neighbours. Reading consecutive frames decodes
+    sequentially; any other frame costs one seek of the capture.
+    """
+
+    def __init__(self, video_file, index_file=None):
+        index = np.fromfile(index_file or index_filename(video_file),
+                            dtype=INDEX_DTYPE)
+        self.positions = dict(zip(index['frame_no'].tolist(),
+                                  index['video_pos'].tolist()))
+        self.__capture = cv2.VideoCapture(video_file)
+        self.__next_pos = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, frame_no):
+        return frame_no in self.positions
+
+    def position(self, frame_no):
+        """Returns video position of `frame_no`, None if it was dropped."""
+        return self.positions.get(int(frame_no))
+
+    def seek(self, frame_no):
+        """Positions the capture so that `read` returns `frame_no` next."""
+        pos = self.position(frame_no)
+        if pos is None:
+            return False
+        if pos != self.__next_pos:
+            self.__capture.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            self.__next_pos = pos
+        return True
+
+    def read(self):
+        valid, frame = self.__capture.read()
+        self.__next_pos += 1
+        return valid, frame
+
+    def frame(self, frame_no):
+        """Returns the frame logged as `frame_no`, None if not available."""
+        if not self.seek(frame_no):
+            return None
+        valid, frame = self.read()
+        return frame if valid else None
+
+    def release(self):
+        self.__capture.release()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('log', help='Binary flight log to export')
+parser.add_argument('-o',
+                    '--output',
+                    default=None,
+                    help='Output csv file. Default is <log>.csv')
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.log)[0] + '.csv'
+    export_csv(args.log, output)
+    print("Exported %d records to %s" % (len(read_flight_log(args.log)),
+                                         output))
@@ -2,6 +2,7 @@
 "Starts the finite state machine for the PTZ tracker"
 import time
 import argparse
+from collections import defaultdict
 import cv2
 
 from state_search import in_search_fn, out_search_fn
@@ -9,38 +10,160 @@ from state_detect import in_detect_fn, out_detect_fn
 from state_id import in_id_fn, out_id_fn
 from state_track import in_track_fn, out_track_fn
 from utils import LTT
+from simulator import SimulatedCamera
+from replay import ReplayCamera, ReplayReader, ReplayFinished
+from detection import DETECTORS
+from dnn import RUNTIMES
 
 parser = argparse.ArgumentParser()
 parser.add_argument('-m',
                     '--model',
                     default=None,
                     help='Path to model to import')
+parser.add_argument('-s',
+                    '--simulate',
+                    action='store_true',
+                    help='Run against a simulated camera on localhost')
+parser.add_argument('-r',
+                    '--replay',
+                    default=None,
+                    help='Flight log (.log next to its .avi) to replay')
+parser.add_argument('--speed',
+                    default=1.0,
+                    type=float,
+                    help='Replay speed factor, 0 replays as fast as possible')
+parser.add_argument('--start-frame',
+                    default=None,
+                    type=int,
+                    help='Log frame_no at which the replay begins')
+parser.add_argument('-d',
+                    '--detector',
+                    default='knn',
+                    choices=sorted(DETECTORS),
+                    help='Detection backend. pyramid finds candidates on a '
+                    'downscaled model, tiled spreads the model over worker '
+                    'processes, motion compensates camera motion and sweeps '
+                    'slowly while detecting')
+parser.add_argument('--detect-scale',
+                    default=None,
+                    type=float,
+                    help='Model scale of the pyramid and motion detectors, '
+                    'e.g. 0.25 finds candidates at quarter resolution')
+parser.add_argument('--detect-workers',
+                    default=4,
+                    type=int,
+                    help='Worker processes of the tiled detector')
+parser.add_argument('--bg-cache',
+                    default=None,
+                    help='Directory keeping background images per search '
+                    'pose across runs')
+parser.add_argument('--search-pan',
+                    nargs=2,
+                    type=int,
+                    default=(0, 0),
+                    metavar=('MIN', 'MAX'),
+                    help='Pan range searched, signed VISCA units')
+parser.add_argument('--search-tilt',
+                    nargs=2,
+                    type=int,
+                    default=(0, 0),
+                    metavar=('MIN', 'MAX'),
+                    help='Tilt range searched, signed VISCA units')
+parser.add_argument('--search-step',
+                    nargs=2,
+                    type=int,
+                    default=(2000, 400),
+                    metavar=('PAN', 'TILT'),
+                    help='Spacing of the search poses')
+parser.add_argument('--dwell',
+                    default=5.0,
+                    type=float,
+                    help='Seconds of detection per search pose')
+parser.add_argument('--runtime',
+                    default='eager',
+                    choices=RUNTIMES,
+                    help='Classifier runtime. torchscript and onnx load the '
+                    '.pt or .onnx model written by export.py')
+parser.add_argument('--threads',
+                    default=None,
+                    type=int,
+                    help='Intra-op threads of the torchscript and onnx '
+                    'runtimes')
+parser.add_argument('--log-format',
+                    default='csv',
+                    choices=['csv', 'binary'],
+                    help='Flight log format, binary logs export with '
+                    'flight_log.py')
 
 if __name__ == "__main__":
     args = parser.parse_args()
-    system = LTT(args.model)
+    detector_options = dict(workers=args.detect_workers)
+    if args.detect_scale is not None:
+        detector_options['scale'] = args.detect_scale
+    options = dict(log_format=args.log_format,
+                   runtime=args.runtime,
+                   threads=args.threads,
+                   detector=args.detector,
+                   detector_options=detector_options,
+                   bg_cache_dir=args.bg_cache,
+                   search=dict(pan_range=args.search_pan,
+                               tilt_range=args.search_tilt,
+                               step=args.search_step,
+                               dwell=args.dwell))
+    if args.simulate:
+        sim = SimulatedCamera().start()
+        system = LTT(args.model,
+                     host=sim.host,
+                     video_source=sim.scene,
+                     **options)
+    elif args.replay:
+        reader = ReplayReader(args.replay,
+                              speed=args.speed,
+                              start_frame=args.start_frame)
+        system = LTT(args.model, camera=ReplayCamera(reader), **options)
+    else:
+        system = LTT(args.model, **options)
     system.fsm.in_pos()
 
-    while True:
-        if system.gui.ABORT:
-            break
-        if system.fsm.is_search():
-            in_search_fn(system)
-            out_search_fn(system)
-        elif system.fsm.is_detect():
-            in_detect_fn(system)
-            out_detect_fn(system)
-        elif system.fsm.is_id():
-            in_id_fn(system)
-            out_id_fn(system)
-        elif system.fsm.is_track():
-            in_track_fn(system)
-            out_track_fn(system)
+    # seconds spent and number of visits per state
+    state_time = defaultdict(float)
+    state_visits = defaultdict(int)
+
+    try:
+        while True:
+            if system.gui.ABORT:
+                break
+            state = system.fsm.state
+            start = time.time()
+            if system.fsm.is_search():
+                in_search_fn(system)
+                out_search_fn(system)
+            elif system.fsm.is_detect():
+                in_detect_fn(system)
+                out_detect_fn(system)
+            elif system.fsm.is_id():
+                in_id_fn(system)
+                out_id_fn(system)
+            elif system.fsm.is_track():
+                in_track_fn(system)
+                out_track_fn(system)
+            state_time[state] += time.time() - start
+            state_visits[state] += 1
+    except ReplayFinished:
+        print('Replay finished')
 
     print('Exiting...')
+    for state in state_time:
+        print('%-7s %4d visits %8.2f s' %
+              (state, state_visits[state], state_time[state]))
+    print('PTZ commands sent: %(sent)d suppressed: %(suppressed)d' %
+          system.camera.scheduler.counters())
     cv2.destroyAllWindows()
     system.camera.ptz.home()
     time.sleep(2)
     system.camera.stop()
     system.logger.close()
+    system.detector.close()
+    if args.simulate:
+        sim.stop()
     print('\n\ndone.')
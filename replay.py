@@ -0,0 +1,177 @@
+"Replays recorded flights in place of the camera"
+import os
+from threading import Thread, Condition
+from time import sleep, monotonic
+
+import numpy as np
+import cv2
+
+import flight_log
+from utils import (Camera, CameraReaderAsync, FrameRingBuffer,
+                   TelemetryHistory, PIDController, PTZScheduler)
+
+
+class ReplayFinished(Exception):
+    "Raised by `ReplayReader.read_frame` once the whole flight was read."
+
+
+class NullPTZ:
+    """Stands in for `CameraIPInterface` and drops every command."""
+
+    def send(self, packet, channel):
+        return True
+
+    def end(self):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: True
+
+
+class ReplayReader(CameraReaderAsync):
+    """Streams frames of a flight video and rows of its log in lock-step.
+
+    Rows are paced by their logged time divided by `speed`. With speed 0
+    frames are replayed as fast as possible, but each one is held back until
+    the previous one was read, so nothing is dropped.
+
+    If the video has an index sidecar, frames are looked up by frame_no and
+    the replay can begin at `start_frame` without decoding the flight up to
+    it. Otherwise rows and frames are paired in order.
+
+    Pacing begins with `start` or the first `read_frame`, so nothing is
+    replayed while the tracker is still being set up.
+    """
+
+    def __init__(self,
+                 log_file,
+                 video_file=None,
+                 speed=1.0,
+                 loop=False,
+                 start_frame=None):
+        if video_file is None:
+            video_file = os.path.splitext(log_file)[0] + '.avi'
+
+        self.fps = CameraReaderAsync.WeightedFramerateCounter()
+        self.rows = flight_log.read_rows(log_file)
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+
+        if os.path.exists(flight_log.index_filename(video_file)):
+            self.__source = flight_log.IndexedVideo(video_file)
+            self.rows = self.rows[[row[0] in self.__source
+                                   for row in self.rows]]
+        else:
+            self.__source = cv2.VideoCapture(video_file)
+            if start_frame is not None:
+                for _ in range(np.sum(self.rows[:, 0] < start_frame)):
+                    self.__source.read()
+        if start_frame is not None:
+            self.rows = self.rows[self.rows[:, 0] >= start_frame]
+
+        capture = cv2.VideoCapture(video_file)
+        self.width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        capture.release()
+
+        # same state as read by the CameraReaderAsync accessors
+        self.frames = FrameRingBuffer(8, self.width, self.height)
+        self.frame_seq = -1
+        self.frame_stamp = 0.0
+        self.dropped_frames = 0
+        self.telemetry = TelemetryHistory()
+
+        self.__consumed = Condition()
+        self.__stopRequested = False
+        self.__closed = False
+        self.__thread = None
+
+    def start(self):
+        """Begins the replay, unless it already runs."""
+        if self.__thread is None:
+            self.__thread = Thread(target=self.__ReplayAsync)
+            self.__thread.start()
+        return self
+
+    def __ReplayAsync(self):
+        while not self.__stopRequested:
+            start = monotonic()
+            for row in self.rows:
+                if self.__stopRequested:
+                    break
+                if isinstance(self.__source, flight_log.IndexedVideo):
+                    self.__source.seek(row[0])
+                valid, frame = self.__source.read()
+                if not valid:
+                    break
+
+                if self.speed > 0:
+                    elapsed = (row[1] - self.rows[0, 1]) / 1000.0
+                    delay = start + elapsed / self.speed - monotonic()
+                    if delay > 0:
+                        sleep(delay)
+                else:
+                    with self.__consumed:
+                        self.__consumed.wait_for(self.__frame_taken)
+
+                stamp = monotonic()
+                self.telemetry.append(stamp, *row[2:5])
+                self.fps.tick()
+                self.frames.write(frame, stamp)
+
+            if not self.loop:
+                break
+            if isinstance(self.__source, flight_log.IndexedVideo):
+                self.__source.seek(self.rows[0, 0])
+            else:
+                self.__source.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+        self.finished = True
+        self.__closed = True
+
+    def __frame_taken(self):
+        return self.frame_seq >= self.frames.seq or self.__stopRequested
+
+    def read_frame(self, timeout=0.1):
+        self.start()
+        if self.finished and self.frame_seq >= self.frames.seq:
+            raise ReplayFinished()
+
+        frame = super().read_frame(timeout)
+        with self.__consumed:
+            self.__consumed.notify_all()
+        return frame
+
+    def stop(self):
+        self.__stopRequested = True
+        with self.__consumed:
+            self.__consumed.notify_all()
+        while self.__thread is not None and not self.__closed:
+            sleep(0.1)
+        self.__source.release()
+
+
+class ReplayCamera(Camera):
+    """`Camera` driven by a `ReplayReader`. Control output is discarded.
+
+    The frame size is the one of the replayed video.
+    """
+
+    controllable = False
+
+    def __init__(self, reader):
+        self.width = reader.width
+        self.height = reader.height
+
+        self.ptz = NullPTZ()
+        self.scheduler = PTZScheduler(self.ptz)
+        self.pan_controller = PIDController()
+        self.tilt_controller = PIDController()
+        self.zoom_controller = PIDController()
+
+        self.cvcamera = None
+        self.cvreader = reader
+
+    def stop(self):
+        self.cvreader.stop()
@@ -0,0 +1,510 @@
+#! /usr/bin/env python3
+"Simulated PTZOptics camera speaking VISCA over TCP/UDP for offline runs"
+import argparse
+import queue
+import socket
+from threading import Thread, Lock
+from time import sleep, monotonic
+
+import numpy as np
+import cv2
+
+import visca
+
+UNITS_PER_DEGREE = 14.4  # 2448 pan units for 170 degrees
+PAN_LIMITS = (-2448, 2448)
+TILT_LIMITS = (-432, 1296)
+ZOOM_LIMITS = (0, 16384)
+WIDE_HFOV = 60.7  # horizontal field of view in degrees at zoom 0
+MAX_ZOOM_RATIO = 20.0
+
+# Replies
+SYNTAX_ERROR = b'\x90\x60\x02\xff'
+
+
+def clamp(val, limits):
+    return min(max(val, limits[0]), limits[1])
+
+
+class PTZDynamics:
+    """Pan, tilt and zoom motor model in camera units.
+
+    Rates are in units per second at the highest speed setting and scale
+    linearly with the VISCA speed byte.
+    """
+
+    def __init__(self, max_pan_rate=1400.0, max_tilt_rate=1000.0,
+                 max_zoom_rate=8000.0):
+        self.max_pan_rate = max_pan_rate
+        self.max_tilt_rate = max_tilt_rate
+        self.max_zoom_rate = max_zoom_rate
+
+        self.pan = 0.0
+        self.tilt = 0.0
+        self.zoom = 0.0
+        self.__pan_vel = 0.0
+        self.__tilt_vel = 0.0
+        self.__zoom_vel = 0.0
+        self.__target = None  # (pan, tilt, pan rate, tilt rate)
+        self.__zoom_target = None
+        self.__last = monotonic()
+        self.__lock = Lock()
+
+    def __pan_rate(self, speed):
+        return self.max_pan_rate * max(speed, 1) / visca.MAX_PAN_SPEED
+
+    def __tilt_rate(self, speed):
+        return self.max_tilt_rate * max(speed, 1) / visca.MAX_TILT_SPEED
+
+    def __zoom_rate(self, speed):
+        return self.max_zoom_rate * (speed + 1) / (visca.MAX_ZOOM_SPEED + 1)
+
+    def drive(self, pan_dir, tilt_dir, pan_speed, tilt_speed):
+        """Continuous motion, direction bytes 1: left/up, 2: right/down."""
+        with self.__lock:
+            self.__update()
+            self.__target = None
+            sign = {0x01: -1, 0x02: 1}
+            self.__pan_vel = sign.get(pan_dir, 0) * self.__pan_rate(pan_speed)
+            self.__tilt_vel = -sign.get(tilt_dir, 0) * self.__tilt_rate(
+                tilt_speed)
+
+    def goto(self, pan, tilt, speed, relative=False):
+        with self.__lock:
+            self.__update()
+            if relative:
+                pan = self.pan + visca.to_signed(pan)
+                tilt = self.tilt + visca.to_signed(tilt)
+            else:
+                pan, tilt = visca.to_signed(pan), visca.to_signed(tilt)
+            self.__pan_vel = self.__tilt_vel = 0.0
+            self.__target = (clamp(pan, PAN_LIMITS), clamp(tilt, TILT_LIMITS),
+                             self.__pan_rate(speed), self.__tilt_rate(speed))
+
+    def zoom_drive(self, direction, speed):
+        """Continuous zoom, direction 1: tele, -1: wide, 0: stop."""
+        with self.__lock:
+            self.__update()
+            self.__zoom_target = None
+            self.__zoom_vel = direction * self.__zoom_rate(speed)
+
+    def zoom_to(self, zoom):
+        with self.__lock:
+            self.__update()
+            self.__zoom_vel = 0.0
+            self.__zoom_target = clamp(zoom, ZOOM_LIMITS)
+
+    def stop(self):
+        self.drive(0x03, 0x03, 0, 0)
+        self.zoom_drive(0, 0)
+
+    def pose(self):
+        """Returns (pan, tilt, zoom) as reported by the camera."""
+        with self.__lock:
+            self.__update()
+            return (int(round(self.pan)) % 65536,
+                    int(round(self.tilt)) % 65536, int(round(self.zoom)))
+
+    def busy(self):
+        """Returns True while an absolute or relative move is running."""
+        with self.__lock:
+            self.__update()
+            return self.__target is not None or self.__zoom_target is not None
+
+    @staticmethod
+    def __approach(val, target, step):
+        if abs(target - val) <= step:
+            return target, True
+        return val + step * np.sign(target - val), False
+
+    def __update(self):
+        now = monotonic()
+        dt = now - self.__last
+        self.__last = now
+
+        if self.__target is not None:
+            pan, tilt, pan_rate, tilt_rate = self.__target
+            self.pan, pan_done = self.__approach(self.pan, pan, pan_rate * dt)
+            self.tilt, tilt_done = self.__approach(self.tilt, tilt,
+                                                   tilt_rate * dt)
+            if pan_done and tilt_done:
+                self.__target = None
+        else:
+            self.pan = clamp(self.pan + self.__pan_vel * dt, PAN_LIMITS)
+            self.tilt = clamp(self.tilt + self.__tilt_vel * dt, TILT_LIMITS)
+
+        if self.__zoom_target is not None:
+            self.zoom, done = self.__approach(self.zoom, self.__zoom_target,
+                                              self.max_zoom_rate * dt)
+            if done:
+                self.__zoom_target = None
+        else:
+            self.zoom = clamp(self.zoom + self.__zoom_vel * dt, ZOOM_LIMITS)
+
+
+class SimulatedScene:
+    """Video source rendering the view of the simulated camera.
+
+    The background is a sky gradient above a ground plane, or frames of a
+    prerecorded `video` looped forever. A drone flying a figure eight is drawn
+    on top at its projected position. Provides the `read`/`release` interface
+    of `cv2.VideoCapture`.
+    """
+
+    def __init__(self, dynamics, width=1920, height=1080, fps=30, video=None,
+                 drone_center=(0.0, 8.0), drone_amplitude=(15.0, 3.0),
+                 drone_period=20.0, drone_size=0.4):
+        self.dynamics = dynamics
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.drone_center = drone_center  # degrees azimuth, elevation
+        self.drone_amplitude = drone_amplitude
+        self.drone_period = drone_period
+        self.drone_size = drone_size  # wingspan in degrees
+
+        self.__video = cv2.VideoCapture(video) if video is not None else None
+        self.__start = monotonic()
+        self.__next_frame = self.__start
+
+        # fixed landmarks (azimuth, elevation, radius in degrees)
+        rng = np.random.RandomState(0)
+        self.__clouds = np.column_stack((rng.uniform(-170, 170, 40),
+                                         rng.uniform(5, 50, 40),
+                                         rng.uniform(1, 4, 40)))
+        self.__trees = np.column_stack((rng.uniform(-170, 170, 120),
+                                        rng.uniform(-3, 0, 120),
+                                        rng.uniform(0.3, 1.5, 120)))
+
+    def drone_position(self, t):
+        """Returns drone azimuth and elevation in degrees at time `t`."""
+        phase = 2 * np.pi * t / self.drone_period
+        return (self.drone_center[0] + self.drone_amplitude[0] * np.sin(phase),
+                self.drone_center[1] +
+                self.drone_amplitude[1] * np.sin(2 * phase))
+
+    def __background(self, tilt_deg, px_per_deg):
+        if self.__video is not None:
+            valid, frame = self.__video.read()
+            if not valid:
+                self.__video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                valid, frame = self.__video.read()
+            if valid:
+                return cv2.resize(frame, (self.width, self.height))
+
+        rows = np.arange(self.height, dtype=np.float32)
+        elev = tilt_deg + (self.height / 2 - rows) / px_per_deg
+        a = np.clip(elev / 60.0, 0, 1)[:, None]
+        colors = (1 - a) * np.float32([235, 206, 180]) + a * np.float32(
+            [200, 120, 40])
+        colors[elev < 0] = (40, 80, 50)
+        return np.repeat(colors.astype(np.uint8)[:, None, :], self.width,
+                         axis=1)
+
+    def __project(self, az, el, pan_deg, tilt_deg, px_per_deg):
+        x = self.width / 2 + (az - pan_deg) * px_per_deg
+        y = self.height / 2 - (el - tilt_deg) * px_per_deg
+        return int(round(x)), int(round(y))
+
+    def render(self, t):
+        pan, tilt, zoom = self.dynamics.pose()
+        pan_deg = visca.to_signed(pan) / UNITS_PER_DEGREE
+        tilt_deg = visca.to_signed(tilt) / UNITS_PER_DEGREE
+        hfov = WIDE_HFOV / MAX_ZOOM_RATIO**(zoom / ZOOM_LIMITS[1])
+        px_per_deg = self.width / hfov
+
+        frame = self.__background(tilt_deg, px_per_deg)
+        if self.__video is None:
+            for color, landmarks in (((245, 245, 245), self.__clouds),
+                                     ((20, 60, 30), self.__trees)):
+                visible = np.abs(landmarks[:, 0] - pan_deg) < hfov
+                for az, el, radius in landmarks[visible]:
+                    cv2.circle(frame,
+                               self.__project(az, el, pan_deg, tilt_deg,
+                                              px_per_deg),
+                               int(radius * px_per_deg), color, -1)
+
+        az, el = self.drone_position(t)
+        center = self.__project(az, el, pan_deg, tilt_deg, px_per_deg)
+        half = max(2, int(self.drone_size * px_per_deg / 2))
+        cv2.ellipse(frame, center, (half, max(1, half // 3)), 0, 0, 360,
+                    (30, 30, 30), -1)
+        return frame
+
+    def read(self):
+        """Returns next frame, paced at the configured frame rate."""
+        delay = self.__next_frame - monotonic()
+        if delay > 0:
+            sleep(delay)
+        self.__next_frame = max(self.__next_frame + 1.0 / self.fps,
+                                monotonic())
+        return True, self.render(monotonic() - self.__start)
+
+    def release(self):
+        if self.__video is not None:
+            self.__video.release()
+
+
+class SimulatedCamera:
+    """VISCA over IP server for the subset used by `CameraIPInterface`.
+
+    Every packet is executed `latency` seconds after it was received. TCP
+    commands are acknowledged, and completed once an absolute move settled.
+    """
+
+    def __init__(self, host='127.0.0.1', tcp_port=5678, udp_port=1259,
+                 latency=0.005, dynamics=None, **scene_args):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.latency = latency
+        self.dynamics = dynamics if dynamics is not None else PTZDynamics()
+        self.scene = SimulatedScene(self.dynamics, **scene_args)
+
+        self.__packets = queue.Queue()
+        self.__completions = []  # (send function, socket number, axis)
+        self.__stopRequested = False
+
+    def start(self):
+        self.__tcp_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__tcp_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__tcp_server.bind((self.host, self.tcp_port))
+        self.__tcp_server.listen(1)
+        self.__tcp_server.settimeout(0.2)
+
+        self.__udp_server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__udp_server.bind((self.host, self.udp_port))
+        self.__udp_server.settimeout(0.2)
+
+        Thread(target=self.__ServeTCP, daemon=True).start()
+        Thread(target=self.__ServeUDP, daemon=True).start()
+        Thread(target=self.__Dispatch, daemon=True).start()
+        print("Simulated camera listening on %s tcp %d udp %d" %
+              (self.host, self.tcp_port, self.udp_port))
+        return self
+
+    def stop(self):
+        self.__stopRequested = True
+        sleep(0.3)
+        self.__tcp_server.close()
+        self.__udp_server.close()
+        self.scene.release()
+
+    def __ServeTCP(self):
+        while not self.__stopRequested:
+            try:
+                conn, _ = self.__tcp_server.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(0.2)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            Thread(target=self.__ServeConnection, args=(conn, ),
+                   daemon=True).start()
+
+    def __ServeConnection(self, conn):
+        rx = bytearray()
+
+        def reply(packet):
+            try:
+                conn.sendall(packet)
+            except socket.error:
+                pass
+
+        while not self.__stopRequested:
+            try:
+                data = conn.recv(1024)
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            if not data:
+                break
+            rx += data
+            packet = visca.pop_packet(rx)
+            while packet is not None:
+                self.__packets.put((monotonic() + self.latency, packet, reply))
+                packet = visca.pop_packet(rx)
+        conn.close()
+
+    def __ServeUDP(self):
+        while not self.__stopRequested:
+            try:
+                data = self.__udp_server.recv(1024)
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            rx = bytearray(data)
+            packet = visca.pop_packet(rx)
+            while packet is not None:
+                self.__packets.put((monotonic() + self.latency, packet, None))
+                packet = visca.pop_packet(rx)
+
+    def __Dispatch(self):
+        while not self.__stopRequested:
+            try:
+                due, packet, reply = self.__packets.get(timeout=0.005)
+                delay = due - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                self.execute(packet, reply)
+            except queue.Empty:
+                pass
+
+            if self.__completions and not self.dynamics.busy():
+                for reply, sock, _ in self.__completions:
+                    reply(bytes((0x90, visca.COMPLETION | sock, 0xFF)))
+                self.__completions = []
+
+    def execute(self, packet, reply=None):
+        """Executes one VISCA packet, replying through `reply` if given."""
+        dyn = self.dynamics
+        body = packet[1:-1]
+
+        if packet == visca.ZOOM_INQUIRY:
+            zoom = dyn.pose()[2]
+            if reply:
+                reply(b'\x90\x50' + visca.nibbles(zoom) + b'\xff')
+            return
+        if packet == visca.PAN_TILT_INQUIRY:
+            pan, tilt, _ = dyn.pose()
+            if reply:
+                reply(b'\x90\x50' + visca.nibbles(pan) + visca.nibbles(tilt) +
+                      b'\xff')
+            return
+
+        settles = False
+        if body[:3] == b'\x01\x06\x01' and len(body) == 7:
+            dyn.drive(body[5], body[6], body[3], body[4])
+        elif body[:3] in (b'\x01\x06\x02', b'\x01\x06\x03') and len(
+                body) == 13:
+            dyn.goto(visca.decode_nibbles(body[5:9]),
+                     visca.decode_nibbles(body[9:13]), body[3],
+                     relative=body[2] == 0x03)
+            settles = 'pan_tilt'
+        elif body in (b'\x01\x06\x04', b'\x01\x06\x05'):  # home, reset
+            dyn.goto(0, 0, visca.MAX_PAN_SPEED)
+            settles = 'pan_tilt'
+        elif body[:3] == b'\x01\x04\x07' and len(body) == 4:
+            direction = {0x20: 1, 0x30: -1}.get(body[3] & 0xF0, 0)
+            dyn.zoom_drive(direction, body[3] & 0x0F)
+        elif body[:3] == b'\x01\x04\x47' and len(body) == 7:
+            dyn.zoom_to(visca.decode_nibbles(body[3:7]))
+            settles = 'zoom'
+        elif body == b'\x01\x00\x01':  # cancel
+            dyn.stop()
+        elif body != b'\x01\x04\x38\x03':  # manual focus needs no action
+            if reply:
+                reply(SYNTAX_ERROR)
+            return
+
+        if reply:
+            # a move replaces the running one of its axis, which is reported
+            # as canceled, so its socket is free again
+            for running in [c for c in self.__completions if c[2] == settles]:
+                running[0](bytes((0x90, visca.ERROR | running[1], 0x04, 0xFF)))
+                self.__completions.remove(running)
+
+            # a camera runs two commands at a time, each on its own socket
+            busy = [sock for _, sock, _ in self.__completions]
+            sock = 1 if 1 not in busy else 2
+            reply(bytes((0x90, visca.ACK | sock, 0xFF)))
+            if settles:
+                self.__completions.append((reply, sock, settles))
+            else:
+                reply(bytes((0x90, visca.COMPLETION | sock, 0xFF)))
+
+
+def bench_telemetry(ptz, duration):
+    """Pipelined and sequential telemetry samples per second."""
+    results = {}
+    for name, poll in (('pipelined', ptz.get_telemetry),
+                       ('sequential', lambda:
+                        (ptz.get_zoom_position(), ptz.get_pan_tilt_position()))):
+        count = 0
+        end = monotonic() + duration
+        while monotonic() < end:
+            poll()
+            count += 1
+        results[name] = count / duration
+    return results
+
+
+def bench_control_latency(ptz, trials):
+    """Seconds from a drive command until telemetry reports motion."""
+    latencies = []
+    for i in range(trials):
+        ptz.goto(0, 0, 24)
+        sleep(0.5)
+        _, pan0, _, _ = ptz.get_telemetry()
+
+        start = monotonic()
+        if i % 2:
+            ptz.left(24)
+        else:
+            ptz.right(24)
+        while monotonic() - start < 1.0:
+            valid, pan, _, _ = ptz.get_telemetry()
+            if valid and pan != pan0:
+                latencies.append(monotonic() - start)
+                break
+        ptz.stop()
+    return np.array(latencies)
+
+
+def bench_render(scene, frames):
+    """Rendered frames per second, without pacing."""
+    start = monotonic()
+    for i in range(frames):
+        scene.render(i / scene.fps)
+    return frames / (monotonic() - start)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--host', default='127.0.0.1', help='Address to serve on')
+parser.add_argument('--tcp-port', default=5678, type=int)
+parser.add_argument('--udp-port', default=1259, type=int)
+parser.add_argument('-l', '--latency', default=0.005, type=float,
+                    help='Seconds before a received packet is executed')
+parser.add_argument('--pan-rate', default=1400.0, type=float,
+                    help='Pan units per second at full speed')
+parser.add_argument('--video', default=None,
+                    help='Prerecorded video used as background')
+parser.add_argument('-b', '--bench', action='store_true',
+                    help='Run throughput and latency benchmarks and exit')
+parser.add_argument('-d', '--duration', default=5.0, type=float,
+                    help='Seconds per throughput benchmark')
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    sim = SimulatedCamera(host=args.host,
+                          tcp_port=args.tcp_port,
+                          udp_port=args.udp_port,
+                          latency=args.latency,
+                          dynamics=PTZDynamics(max_pan_rate=args.pan_rate),
+                          video=args.video).start()
+
+    if not args.bench:
+        try:
+            while True:
+                sleep(1)
+        except KeyboardInterrupt:
+            sim.stop()
+    else:
+        from utils import CameraIPInterface
+
+        ptz = CameraIPInterface(host=args.host,
+                                tcp_port=args.tcp_port,
+                                udp_port=args.udp_port).init()
+        rates = bench_telemetry(ptz, args.duration)
+        print("Telemetry: %.1f samples/s pipelined, %.1f sequential" %
+              (rates['pipelined'], rates['sequential']))
+
+        latencies = bench_control_latency(ptz, 10) * 1000
+        if len(latencies):
+            print("Control latency: mean %.1f ms, median %.1f ms, max %.1f ms"
+                  % (latencies.mean(), np.median(latencies), latencies.max()))
+
+        print("Render: %.1f frames/s" % bench_render(sim.scene, 60))
+        ptz.end()
+        sim.stop()
@@ -1,19 +1,7 @@
 "Detection state as part of the PTZ tracker finite state machine"
 import cv2
 
-from utils import expand_bbox
-
-
-def add_padding(rect_par, ratio, dims):
-    x, y, w, h = rect_par
-    padx = int(w * ratio)
-    pady = int(h * ratio)
-
-    if x - padx < 0 or y - pady < 0 or x + w + 2 * padx > dims[
-            0] or y + h + 2 * pady > dims[0]:
-        return x, y, w, h
-    else:
-        return x - padx, y - pady, w + 2 * padx, h + 2 * pady
+from detection import CandidateAccumulator, merge_candidates
 
 
 def in_detect_fn(system):
@@ -22,49 +10,51 @@ def in_detect_fn(system):
     system.cur_imgs = []
     system.cur_bboxes = []
 
-    # Tuning parameters
-    kernel_size = 5
-    padding_ratio = 0.1
-    area_threshold = 100
+    # Tuning parameters, those of the mask are kept by the detector
+    max_candidates = 8  # bounds the batch classified by in_id_fn
+    window = 5  # frames a candidate must persist in, min_hits of them
+    min_hits = 3
+    sweep_speed = 1
 
     found = False
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE,
-                                       (kernel_size, kernel_size))
     res = (system.camera.width, system.camera.height)
+    accumulator = CandidateAccumulator(window, min_hits)
+
+    # the model follows the camera, so sweep slowly while detecting
+    sweep = system.detector.follows_camera and system.camera.controllable
+    if sweep:
+        system.camera.ptz.left(sweep_speed)
 
     while not system.timer_expir:
         frame = system.get_frame()
         if frame is None:
             continue
 
-        fgmask = system.bg_model.apply(frame)
-        fgmask = cv2.medianBlur(fgmask, 3)
-        fgmask = cv2.dilate(fgmask, kernel, iterations=1)
-        #fgmask = cv2.medianBlur(fgmask, 9)
-        #fgmask = cv2.dilate(fgmask, kernel, iterations=5)
+        fgmask, candidates = system.detector.detect(frame)
+        candidates = merge_candidates(candidates, max_candidates, *res)
 
         system.update_gui(frame=frame,
                           ch3_fgmask=cv2.cvtColor(fgmask, cv2.COLOR_GRAY2BGR))
 
-        _, contours, _ = cv2.findContours(fgmask, cv2.RETR_LIST,
-                                          cv2.CHAIN_APPROX_TC89_L1)
-
-        for c in contours:
-            if cv2.contourArea(c) > area_threshold:
-                found = True
-                rect_par = cv2.boundingRect(c)
-                x, y, w, h = add_padding(rect_par, padding_ratio, res)
-                system.cur_bboxes.append((x, y, w, h))
-
-                x, y, w, h = expand_bbox(
-                    *add_padding(rect_par, padding_ratio, res))
-                system.cur_imgs.append(frame[y:y + h, x:x + w])
+        # only candidates seen over several frames are identified
+        candidates = accumulator.update(candidates)
+        for box, (x, y, w, h) in zip(candidates['box'], candidates['crop']):
+            found = True
+            system.cur_bboxes.append(tuple(box.tolist()))
+            system.cur_imgs.append(frame[y:y + h, x:x + w])
 
         if found:
-            system.initial_frame = frame.copy()
-            system.fsm.found_obj()
+            with system.expiry_lock:
+                # too late, the camera already heads for the next pose
+                if system.timer_expir:
+                    break
+                system.initial_frame = frame.copy()
+                system.fsm.found_obj()
+            if sweep:
+                system.camera.stop_motion()
             return
 
+    # the goto of expiry has replaced the sweep, it must not be stopped
     system.fsm.timeout()
 
 
@@ -1,32 +1,37 @@
 "Identification state as part of the PTZ tracker finite state machine"
+from threading import Thread
+from queue import Queue, Empty
 from torchvision.transforms import Compose
-from torch import cat
 from numpy import argmax
 from fastai.vision import *
 
-from dnn import real_time_evaluate, read_stats, Normalize, Resize, ToTensor
+from dnn import (real_time_evaluate, read_stats, Normalize, Resize, ToTensor,
+                 BatchPreprocessor)
 from utils import expand_bbox
 
 data_prep = Compose(
     [Resize(224),
      Normalize(read_stats("./dataset_stats")),
      ToTensor()])
+batch_prep = BatchPreprocessor(read_stats("./dataset_stats"))
 
 
 def in_id_fn(system):
 
-    transformed_ims = [data_prep(img) for img in system.cur_imgs]
     # transformed_ims = [Image(data_prep(img)) for img in system.cur_imgs]
 
-    predictions = real_time_evaluate(system.network, cat(transformed_ims))
+    predictions = real_time_evaluate(system.network,
+                                     batch_prep(system.cur_imgs)).ravel()
     # predictions = real_time_evaluate_fastai(system.network, transformed_ims)
 
     drone = False
     max_pred_i = argmax(predictions)
     max_pred = predictions[max_pred_i]
+    system.drone_score = float(max_pred)
 
     if max_pred >= system.detect_thresh:
         system.drone_bbox = system.cur_bboxes[max_pred_i]
+        system.planner.record_detection(*system.get_frame_telemetry()[:2])
         system.fsm.drone()
         drone = True
         print("Drone identified")
@@ -39,8 +44,8 @@ def out_id_fn(system):
     pass
 
 
-def async_id(system, frame):
-
+def crop_roi(system, frame):
+    "Returns the expanded drone bounding box region of `frame`."
     vals = [int(a) for a in system.drone_bbox]
     vals = [
         max(0, vals[0]),
@@ -53,8 +58,14 @@ def async_id(system, frame):
 
     roi = frame[y:y + h, x:x + w].copy()
     system.update_gui(async_frame=roi)
+    return roi
+
+
+def async_id(system, frame):
 
-    prediction = real_time_evaluate(system.network, data_prep(roi))[0]
+    roi = crop_roi(system, frame)
+
+    prediction = real_time_evaluate(system.network, batch_prep([roi]))[0]
     if prediction >= system.detect_thresh:
         return 1
     else:
@@ -63,18 +74,7 @@ def async_id(system, frame):
 
 def async_id_fastai(system, frame):
 
-    vals = [int(a) for a in system.drone_bbox]
-    vals = [
-        max(0, vals[0]),
-        max(0, vals[1]),
-        min(1920, vals[2]),
-        min(1080, vals[3])
-    ]
-
-    x, y, w, h = expand_bbox(*vals)
-
-    roi = frame[y:y + h, x:x + w].copy()
-    system.update_gui(async_frame=roi)
+    roi = crop_roi(system, frame)
 
     prediction = real_time_evaluate_fastai(system.network,
                                            Image(data_prep(roi)))[0]
@@ -82,3 +82,54 @@ def async_id_fastai(system, frame):
         return 1
     else:
         return 0
+
+
+class IdentificationWorker:
+    """Identifies regions of interest on a worker thread.
+
+    `submit` hands over a ROI without waiting for the classifier. Only the
+    latest ROI is kept: one submitted while the previous is still waiting
+    replaces it. Statuses (1 drone, 0 not) are collected with `results`.
+    """
+
+    def __init__(self, network, threshold):
+        self.network = network
+        self.threshold = threshold
+        self.__requests = Queue(maxsize=1)
+        self.__results = Queue()
+        self.__worker = Thread(target=self.__IdentifyAsync, daemon=True)
+        self.__worker.start()
+
+    def submit(self, roi):
+        """Queues `roi` for identification, replacing a waiting one."""
+        try:
+            self.__requests.get_nowait()
+        except Empty:
+            pass
+        self.__requests.put_nowait(roi)
+
+    def results(self):
+        """Returns the statuses identified since the last call, oldest first."""
+        statuses = []
+        while True:
+            try:
+                statuses.append(self.__results.get_nowait())
+            except Empty:
+                return statuses
+
+    def close(self):
+        """Drops a waiting ROI and waits for the running identification."""
+        try:
+            self.__requests.get_nowait()
+        except Empty:
+            pass
+        self.__requests.put(None)
+        self.__worker.join()
+
+    def __IdentifyAsync(self):
+        while True:
+            roi = self.__requests.get()
+            if roi is None:
+                return
+            prediction = real_time_evaluate(self.network, batch_prep([roi]))[0]
+            self.__results.put(1 if prediction >= self.threshold else 0)
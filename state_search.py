@@ -1,39 +1,30 @@
 "Search state as part of the PTZ tracker finite state machine"
 from threading import Timer
-import time
-import cv2
 
 
 def in_search_fn(system):
-    """Search heuristic."""
+    """Moves the camera to the next pose of the search planner."""
     print('=== search')
-    local_timer = time.time()
-    #pan_target = int(random.random()*1000)+1
-    pan_target = 0
-    if pan_target > 500:
-        pan_target = int((pan_target - 500) * 4.894 / 4)
-    else:
-        pan_target = int(65535 - pan_target * 4.894 / 4)
+    planner = system.planner
+
+    # replayed flights are always in position
+    in_pos = not system.camera.controllable
+    if not in_pos:
+        # the pose may already be picked and headed for since the last
+        # dwell ended, but detection or tracking may have stopped that move
+        if planner.move is None:
+            planner.advance()
+        move = planner.goto(system.camera)
+
+    # leave as soon as the move completed or telemetry converged
+    while not in_pos and not move.wait(timeout=1 / 30):
+        if move.expired:
+            move = planner.goto(system.camera)
 
-    # move camera into position
-    in_pos = False
-    while not in_pos:
         # Update GUI
         frame = system.get_frame()
-        if frame is None:
-            continue
-        system.update_gui(frame=frame)
-
-        time.sleep(1 / 30)
-        if time.time() > local_timer + 0.5:
-            local_timer = time.time()
-            telemetry = system.get_telemetry()
-            pan, tilt, zoom = telemetry
-            if pan == pan_target and zoom == 0:
-                in_pos = True
-            else:
-                system.camera.ptz.goto(pan_target, 0, 24)
-                system.camera.ptz.zoomto(0)
+        if frame is not None:
+            system.update_gui(frame=frame)
 
     # trigger in_pos transition
     print("in_pos")
@@ -42,9 +33,17 @@ def in_search_fn(system):
 
 def out_search_fn(system):
     """Generates background model."""
-    system.bg_model = cv2.createBackgroundSubtractorKNN(detectShadows=False)
+    system.detector.reset()
+
+    # a known pose only needs the cached background refreshed
+    pose = system.get_telemetry()
+    background = system.bg_cache.get(pose)
+    if background is not None:
+        system.bg_cache.seed(system.detector, background)
+        pxcnt = 10
+    else:
+        pxcnt = 60
 
-    pxcnt = 60
     for init_count in range(pxcnt):
 
         # get most recent frame
@@ -54,11 +53,15 @@ def out_search_fn(system):
         system.update_gui(frame=frame)
 
         # create background
-        system.bg_model.apply(frame)
+        system.detector.apply(frame)
 
+    system.bg_cache.store(pose, system.detector,
+                          (system.camera.width, system.camera.height))
     print("bg_generated")
 
     # set and start timer for detection state
     system.timer_expir = False
-    system.timer_obj = Timer(system.timeout_interval, system.expiry, ())
+    dwell = system.planner.dwell() if system.camera.controllable else \
+        system.timeout_interval
+    system.timer_obj = Timer(dwell, system.expiry, ())
     system.timer_obj.start()
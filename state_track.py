@@ -3,7 +3,7 @@ import time
 import numpy as np
 import cv2
 
-from state_id import async_id
+from state_id import crop_roi, IdentificationWorker
 
 
 def in_track_fn(system):
@@ -20,22 +20,27 @@ def in_track_fn(system):
     estimated_drone_prob = 1.0
     alpha = 0.1
 
-    while success:
-        zoom = system.get_telemetry()[2]
-        move(system, zoom)
+    # identification runs beside the control loop
+    worker = IdentificationWorker(system.network, system.detect_thresh)
 
+    while success:
         # get next frame
         frame = system.get_frame()
         if frame is None:
             continue
 
+        # camera zoom at the time the frame was captured
+        zoom = system.get_frame_telemetry()[2]
+
         # update tracker
         success, system.drone_bbox = system.tracker.update(frame)
         if not success:
-            system.camera.ptz.stop()
+            system.camera.stop_motion()
             system.camera.ptz.zoomto(0)
             break
 
+        move(system, zoom)
+
         # Draw bounding box
         x, y, w, h = system.drone_bbox
         cv_im = frame.copy()
@@ -44,26 +49,29 @@ def in_track_fn(system):
         cv2.rectangle(cv_im, p1, p2, (255, 0, 0), 2, 1)
         system.update_gui(frame=cv_im)
 
-        # if time is left, identify object in bbox
+        # periodically hand object in bbox to the identification worker
         if time.time() - local_timer > timeout:
-            status = async_id(system, frame)
-
-            # exponential weighted moving average
-            estimated_drone_prob = (
-                1 - alpha) * estimated_drone_prob + alpha * status
+            worker.submit(crop_roi(system, frame))
 
             # reset timer
             local_timer = time.time()
 
-            # drone is probably lost
-            if estimated_drone_prob < 0.5:
-                break
+        # exponential weighted moving average of the identified statuses
+        for status in worker.results():
+            estimated_drone_prob = (
+                1 - alpha) * estimated_drone_prob + alpha * status
+        system.drone_score = estimated_drone_prob
+
+        # drone is probably lost
+        if estimated_drone_prob < 0.5:
+            break
 
         # user quit inititated
         if system.gui.RESET or system.gui.ABORT:
             system.gui.RESET = False
             break
 
+    worker.close()
     system.fsm.lost_track()
 
 
@@ -89,6 +97,9 @@ def scale_factor(zoom_value):
 def out_track_fn(system):
     print('lost_track')
 
+    # search moves the camera directly, forget the last tracking commands
+    system.camera.scheduler.reset()
+
     # reinitialize short-term tracker
     system.tracker = cv2.TrackerCSRT_create()
     system.drone_bbox = None
@@ -0,0 +1,105 @@
+"Tests of the VISCA reply handling of CameraIPInterface, without a camera"
+import socket
+import time
+import unittest
+
+from utils import CameraIPInterface
+
+
+def nibbles(val, count=4):
+    return bytes((val >> shift) & 0x0F
+                 for shift in range(4 * (count - 1), -1, -4))
+
+
+def zoom_reply(zoom):
+    return b'\x90\x50' + nibbles(zoom) + b'\xff'
+
+
+def pan_tilt_reply(pan, tilt):
+    return b'\x90\x50' + nibbles(pan) + nibbles(tilt) + b'\xff'
+
+
+class ScriptedSocket:
+    """TCP socket returning scripted data, None stands for a read timeout."""
+
+    def __init__(self):
+        self.script = []
+
+    def send(self, data):
+        return len(data)
+
+    def recv(self, size):
+        if not self.script:
+            raise socket.timeout()
+        data = self.script.pop(0)
+        if data is None:
+            raise socket.timeout()
+        return data
+
+
+class InquiryTest(unittest.TestCase):
+    def setUp(self):
+        self.ptz = CameraIPInterface('camera')
+        self.socket = ScriptedSocket()
+        self.ptz._tcp_socket = self.socket
+
+    def test_telemetry(self):
+        self.socket.script = [zoom_reply(100), pan_tilt_reply(200, 300)]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 200, 300, 100))
+
+    def test_late_replies_skipped(self):
+        self.socket.script = [None]
+        self.assertFalse(self.ptz.get_telemetry()[0])
+
+        # replies of the timed out inquiries arrive before the new ones
+        self.socket.script = [
+            zoom_reply(1), pan_tilt_reply(2, 3), zoom_reply(100),
+            pan_tilt_reply(200, 300)
+        ]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 200, 300, 100))
+
+    def test_recovers_from_lost_replies(self):
+        self.ptz.LATE_REPLY_TIMEOUT = 0.05
+        self.socket.script = [None]
+        self.assertFalse(self.ptz.get_telemetry()[0])
+
+        # the late replies never come
+        time.sleep(0.1)
+        self.socket.script = [zoom_reply(100), pan_tilt_reply(200, 300)]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 200, 300, 100))
+
+        self.socket.script = [zoom_reply(101), pan_tilt_reply(201, 301)]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 201, 301, 101))
+
+    def test_lost_reply_skipped_by_length(self):
+        self.socket.script = [None]
+        self.assertFalse(self.ptz.get_telemetry()[0])
+
+        # only the late pan/tilt reply arrives, the zoom one was lost
+        self.socket.script = [
+            pan_tilt_reply(2, 3), zoom_reply(100),
+            pan_tilt_reply(200, 300)
+        ]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 200, 300, 100))
+
+    def test_command_error_on_socket_zero(self):
+        command = self.ptz.command(b'\x81\x01\x06\x02\x18\x14\xff')
+        self.socket.script = [
+            b'\x90\x60\x03\xff', zoom_reply(100),
+            pan_tilt_reply(200, 300)
+        ]
+        self.assertEqual(self.ptz.get_telemetry(), (True, 200, 300, 100))
+        self.assertEqual(command.status, 'error')
+
+        # the next command gets its own ACK and completion
+        command = self.ptz.command(b'\x81\x01\x06\x02\x18\x14\xff')
+        self.socket.script = [
+            b'\x90\x41\xff', b'\x90\x51\xff', zoom_reply(100),
+            pan_tilt_reply(200, 300)
+        ]
+        self.assertTrue(self.ptz.get_telemetry()[0])
+        self.assertEqual((command.socket, command.status), (1, 'completed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 "Bucket of utility function and classes"
 from threading import Thread
-from threading import Lock
-from time import sleep, time, strftime
+from threading import Lock, Condition
+from time import sleep, time, strftime, monotonic
+from collections import deque
+from queue import Queue, Full, Empty
+from bisect import bisect_left
 import re
 import binascii
 import socket
@@ -9,23 +12,40 @@ import numpy as np
 from std_msgs.msg import String
 import cv2
 
+import visca
+from flight_log import BinaryFlightLog, INDEX_RECORD
+
 from transitions import Machine, State
 from threading import Timer
 import rospy
 
-from dnn import initialize_net, Resize
+from dnn import initialize_runtime, Resize
+from detection import BackgroundCache, create_detector
 
 
 class LTT:
     """Long-Term Tracker Class."""
 
-    def __init__(self, model_path):
+    def __init__(self,
+                 model_path,
+                 host='192.168.2.42',
+                 video_source=None,
+                 camera=None,
+                 log_format='csv',
+                 detector='knn',
+                 detector_options=None,
+                 bg_cache_dir=None,
+                 search=None,
+                 runtime='eager',
+                 threads=None):
         # Logging and viewing
         self.start_msec = int(round(time() * 1000))
         self.gui = GUI()
         self.logger = Logger(camera_width=1920,
                              camera_height=1080,
-                             start_time=self.start_msec)
+                             start_time=self.start_msec,
+                             on_write=self.publish,
+                             log_format=log_format)
 
         # initialize ROS publisher
         self.pub = rospy.Publisher('telemetry', String, queue_size=10)
@@ -34,15 +54,22 @@ class LTT:
         # Tracker system objects
         self.fsm = FSM()
         self.tracker = cv2.TrackerCSRT_create()
-        self.network = initialize_net(model_path)
-        self.camera = Camera(log_video=self.log_video,
-                             log_data=self.log_data,
-                             pan_controller=PIDController(),
-                             tilt_controller=PIDController(),
-                             zoom_controller=PIDController())
+        self.network = initialize_runtime(runtime, model_path,
+                                          threads=threads)
+        if camera is not None:
+            self.camera = camera
+        else:
+            self.camera = Camera(log_frame=self.log_frame,
+                                 pan_controller=PIDController(),
+                                 tilt_controller=PIDController(),
+                                 zoom_controller=PIDController(),
+                                 host=host,
+                                 video_source=video_source)
 
         self.timeout_interval = 5
+        self.planner = SearchPlanner(**(search or {}))
         self.timer_obj = Timer(self.timeout_interval, self.expiry, ())
+        self.expiry_lock = Lock()  # orders expiry against found_obj
 
         # Variables
         self.cur_imgs = []
@@ -50,9 +77,13 @@ class LTT:
         self.drone_bbox = None
         self.initial_frame = None
         self.timer_expir = True  # bool for if timer expired
-        self.bg_model = None
+        self.detector = create_detector(detector, self.camera.width,
+                                        self.camera.height,
+                                        **(detector_options or {}))
+        self.bg_cache = BackgroundCache(bg_cache_dir)
         self.frame_count = 1
         self.detect_thresh = 0.85
+        self.drone_score = -1.0  # latest drone probability, -1 if unknown
 
         # Initialization routine
         init_count = 0
@@ -61,24 +92,32 @@ class LTT:
             init_count += 1
 
     def expiry(self):
-        self.timer_expir = True
-
-    def log_data(self):
-        # local log
-        telemetry = self.get_telemetry()
-        bbox = self.drone_bbox
-        self.logger.log_data(telemetry, bbox, self.frame_count)
-
-        # ROS logger
-        out = "{},{},{},{},{},".format(
-            self.frame_count, int(round(time() * 1000) - self.start_msec),
-            *telemetry)
-        self.pub.publish(out)
-
-    def log_video(self, frame):
-        self.logger.log_video(frame, self.drone_bbox)
+        with self.expiry_lock:
+            self.timer_expir = True
+
+            # head for the next pose while the detection loop winds down,
+            # unless it already found a target
+            if self.fsm.is_detect() and self.camera.controllable:
+                self.planner.advance()
+                self.planner.goto(self.camera)
+
+    def log_frame(self, frame, stamp=None):
+        # hand frame with the pose at its capture time to the logger thread
+        telemetry = self.get_telemetry(stamp)
+        self.logger.log(frame,
+                        telemetry,
+                        self.drone_bbox,
+                        self.frame_count,
+                        state=self.fsm.state,
+                        score=self.drone_score,
+                        stamp=stamp)
         self.frame_count += 1
 
+    def publish(self, frame_count, time_ms, telemetry):
+        # ROS logger, called from the logger thread
+        out = "{},{},{},{},{},".format(frame_count, time_ms, *telemetry)
+        self.pub.publish(out)
+
     def update_gui(self, frame=None, ch3_fgmask=None, async_frame=None):
         if not self.gui.initialized:
             self.gui.init(frame)
@@ -90,46 +129,132 @@ class LTT:
     def get_frame(self):
         return self.camera.cvreader.read_frame()
 
-    def get_telemetry(self):
-        return self.camera.cvreader.read_telemetry()
+    def get_telemetry(self, stamp=None):
+        return self.camera.cvreader.read_telemetry(stamp)
+
+    def get_frame_telemetry(self):
+        """Returns camera pose at capture time of the last frame read."""
+        return self.get_telemetry(self.camera.cvreader.frame_stamp)
 
     def start_tracker(self):
         return self.tracker.init(self.initial_frame, self.drone_bbox)
 
 
 class Logger:
-    """Logs telemetry data (i.e., pan, tilt, and zoom) and bounding box."""
+    """Logs telemetry data (i.e., pan, tilt, and zoom) and bounding box.
+
+    Frames are queued by `log` and encoded and written by a writer thread, so
+    the capture thread never waits for the disk or the encoder. When the
+    queue is full, `policy` decides: 'drop_newest' drops the frame being
+    logged, 'drop_oldest' the oldest queued one and 'block' waits for room.
+    Telemetry rows are dropped together with their frames.
+    """
 
     def __init__(self,
                  camera_width,
                  camera_height,
                  start_time,
                  fps=30.0,
-                 filename=None):
+                 filename=None,
+                 on_write=None,
+                 queue_size=30,
+                 policy='drop_newest',
+                 log_format='csv'):
 
         # initialize file name
         if filename is None:
             timestamp = strftime("%d-%m-%Y_%H-%M-%S")
-            logname = "./flight_logs/" + timestamp + ".log"
+            extension = ".bin" if log_format == 'binary' else ".log"
+            logname = "./flight_logs/" + timestamp + extension
             self.filename = logname
         else:
             self.filename = filename
 
-        # open video file
+        # open video file and its frame_no to video position index
         self.fourcc = cv2.VideoWriter_fourcc(*'XVID')
         self.vout = cv2.VideoWriter('.' + self.filename.split('.')[1] + '.avi',
                                     self.fourcc, fps,
                                     (camera_width, camera_height))
+        self.indexfile = open('.' + self.filename.split('.')[1] + '.idx',
+                              'wb')
 
         # opening and initializing log file
         self.start_time = start_time
-        self.logfile = open(self.filename, 'w')
-        self.logfile.write("frame_no,time,cam_pan,cam_tilt,cam_zoom,x,y,w,h\n")
+        self.log_format = log_format
+        if log_format == 'binary':
+            self.logfile = BinaryFlightLog(self.filename)
+        else:
+            self.logfile = open(self.filename, 'w')
+            self.logfile.write(
+                "frame_no,time,cam_pan,cam_tilt,cam_zoom,x,y,w,h\n")
+
+        # writer thread and its queue
+        self.on_write = on_write
+        self.policy = policy
+        self.written = 0
+        self.dropped = 0
+        self.__queue = Queue(maxsize=queue_size)
+        self.__writer = Thread(target=self.__WriteAsync)
+        self.__writer.start()
 
     def close(self):
+        """Writes all queued frames, then closes video and log file."""
+        self.__queue.put(None)
+        self.__writer.join()
+        self.vout.release()
+        self.indexfile.close()
         self.logfile.close()
+        print("Logged %d frames, dropped %d" % (self.written, self.dropped))
+
+    def log(self,
+            frame,
+            telemetry,
+            bbox,
+            frame_count,
+            state=None,
+            score=-1.0,
+            stamp=None):
+        """Queues frame with its telemetry and bounding box for writing.
+
+        The frame is not copied, it must not be modified afterwards.
+        """
+        time_ms = int(round(time() * 1000) - self.start_time)
+        stamp = monotonic() if stamp is None else stamp
+        record = (frame, tuple(telemetry), bbox, frame_count, time_ms, state,
+                  score, stamp)
+
+        if self.policy == 'block':
+            self.__queue.put(record)
+            return
+        try:
+            self.__queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+            if self.policy == 'drop_oldest':
+                try:
+                    self.__queue.get_nowait()
+                except Empty:
+                    pass
+                self.__queue.put_nowait(record)
+
+    def __WriteAsync(self):
+        while True:
+            record = self.__queue.get()
+            if record is None:
+                return
+            frame, telemetry, bbox, frame_count, time_ms = record[:5]
+            if self.log_format == 'binary':
+                state, score, stamp = record[5:]
+                self.logfile.append(frame_count, stamp, telemetry, bbox,
+                                    state, score)
+            else:
+                self.log_data(telemetry, bbox, frame_count, time_ms)
+            self.log_video(frame, bbox, frame_count)
+            if self.on_write is not None:
+                self.on_write(frame_count, time_ms, telemetry)
+            self.written += 1
 
-    def log_data(self, telemetry, bbox, frame_count):
+    def log_data(self, telemetry, bbox, frame_count, time_ms):
         """Logs telemetry and bounding box information."""
 
         if bbox is not None:
@@ -138,14 +263,14 @@ class Logger:
             x, y, w, h = -1, -1, -1, -1
 
         # format output
-        out = "%d,%d,%d,%d,%d,%d,%d,%d,%d\n" % (
-            frame_count, int(round(time() * 1000) - self.start_time),
-            *telemetry, x, y, w, h)
+        out = "%d,%d,%d,%d,%d,%d,%d,%d,%d\n" % (frame_count, time_ms,
+                                                *telemetry, x, y, w, h)
 
         self.logfile.write(out)
 
-    def log_video(self, frame, bbox):
+    def log_video(self, frame, bbox, frame_count):
         self.vout.write(frame)
+        self.indexfile.write(INDEX_RECORD.pack(frame_count, self.written))
 
 
 class GUI:
@@ -241,9 +366,11 @@ class FSM:
 
 
 class Camera:
+    # False for sources whose pose does not follow our commands (replays)
+    controllable = True
+
     def __init__(self,
-                 log_video,
-                 log_data,
+                 log_frame,
                  pan_controller,
                  tilt_controller,
                  zoom_controller,
@@ -253,39 +380,59 @@ class Camera:
                  fps=60,
                  host='192.168.2.42',
                  tcp_port=5678,
-                 udp_port=1259):
+                 udp_port=1259,
+                 video_source=None):
 
         # Camera params
         self.width = width
         self.height = height
 
         # Connect to PTZOptics camera for controls
-        self.ptz = CameraIPInterface(host=host, tcp_port=5678,
-                                     udp_port=1259).init()
+        self.ptz = CameraIPInterface(host=host, tcp_port=tcp_port,
+                                     udp_port=udp_port).init()
+        self.scheduler = PTZScheduler(self.ptz)
         self.pan_controller = pan_controller
         self.tilt_controller = tilt_controller
         self.zoom_controller = zoom_controller
 
-        # Open video stream as CV camera
-        self.cvcamera = cv2.VideoCapture(usbdevnum)
-        self.cvcamera.set(3, width)
-        self.cvcamera.set(4, height)
-        self.cvcamera.set(5, fps)
+        # Open video stream as CV camera unless another source is given
+        if video_source is not None:
+            self.cvcamera = video_source
+        else:
+            self.cvcamera = cv2.VideoCapture(usbdevnum)
+            self.cvcamera.set(3, width)
+            self.cvcamera.set(4, height)
+            self.cvcamera.set(5, fps)
 
         # object running threads to get most recent frame and most recent zoom
-        self.cvreader = CameraReaderAsync(log_video=log_video,
-                                          log_data=log_data,
+        self.cvreader = CameraReaderAsync(log_frame=log_frame,
                                           videoSource=self.cvcamera,
-                                          ptz=self.ptz)
+                                          ptz=self.ptz,
+                                          width=width,
+                                          height=height)
 
     def stop(self):
         self.cvreader.stop()
         self.cvcamera.release()
         self.ptz.end()
 
-    def control(self, pan_error, tilt_error):
+    def move_to(self, pan, tilt, zoom=None, speed=24, tolerance=16,
+                timeout=10.0):
+        """Starts an absolute move and returns it as `PTZMove` to wait on.
 
-        dur = 0.001
+        Pan and tilt are signed VISCA units, zoom is left alone if None.
+        """
+        commands = [
+            self.ptz.command(
+                visca.encode_position(0x02, pan & 0xFFFF, tilt & 0xFFFF,
+                                      speed))
+        ]
+        if zoom is not None:
+            commands.append(
+                self.ptz.command(visca.encode_zoom_position(zoom)))
+        return PTZMove(self, commands, (pan, tilt, zoom), tolerance, timeout)
+
+    def control(self, pan_error, tilt_error):
 
         pan_command = self.pan_controller.compute(
             pan_error)  # positive means turn left
@@ -295,47 +442,27 @@ class Camera:
         pan_speed = self.limit(pan_command, 24)  # max speed for pan is 24
         tilt_speed = self.limit(tilt_command, 18)  # max speed for titlt is 18
 
-        if pan_speed == 0 and tilt_speed == 0:
-            self.ptz.stop()
-            sleep(dur)
+        horizontal = 'left' if pan_command >= 0 else 'right'
+        vertical = 'up' if tilt_command >= 0 else 'down'
 
+        if pan_speed == 0 and tilt_speed == 0:
+            packet = visca.STOP
         elif pan_speed == 0:
-            if tilt_command == abs(tilt_command):
-                self.ptz.up(tilt_speed)
-                sleep(dur)
-            else:
-                self.ptz.down(tilt_speed)
-                sleep(dur)
+            packet = visca.drive(vertical, visca.IDLE_SPEED, tilt_speed)
         elif tilt_speed == 0:
-            if pan_command == abs(pan_command):
-                self.ptz.left(pan_speed)
-                sleep(dur)
-            else:
-                self.ptz.right(pan_speed)
-                sleep(dur)
-
-        elif abs(pan_command) == pan_command and abs(
-                tilt_command) == tilt_command:
-            self.ptz.left_up(pan_speed, tilt_speed)
-            sleep(dur)
-
-        elif abs(pan_command
-                 ) == pan_command and abs(tilt_command) != tilt_command:
-            self.ptz.left_down(pan_speed, tilt_speed)
-            sleep(dur)
-
-        elif abs(pan_command) != pan_command and abs(
-                tilt_command) == tilt_command:
-            self.ptz.right_up(pan_speed, tilt_speed)
-            sleep(dur)
-
-        elif abs(pan_command) != pan_command and abs(
-                tilt_command) != tilt_command:
-            self.ptz.right_down(pan_speed, tilt_speed)
-            sleep(dur)
+            packet = visca.drive(horizontal, pan_speed, visca.IDLE_SPEED)
+        else:
+            packet = visca.drive(horizontal + '_' + vertical, pan_speed,
+                                 tilt_speed)
+        self.scheduler.submit(PTZScheduler.PAN_TILT, packet)
 
         return pan_speed, tilt_speed
 
+    def stop_motion(self):
+        """Stops pan/tilt immediately, dropping any held commands."""
+        self.scheduler.reset()
+        self.scheduler.submit(PTZScheduler.PAN_TILT, visca.STOP, force=True)
+
     @staticmethod
     def errors_pt(center, width, height):
         # Pos. pan error: right. Pos. tilt error: down
@@ -352,26 +479,406 @@ class Camera:
 
     def control_zoom(self, error):
 
-        dur = 0.001
-
         zoom_command = self.zoom_controller.compute(
             error)  # positive means zoom in
         zoom_speed = self.limit(zoom_command, 1)
 
-        if not zoom_speed:
-            self.ptz.zoomstop()
-            sleep(dur)
-
+        # a zoom at speed 0 is still slowly zooming, only stop on no command
         if zoom_command > 0:
-            self.ptz.zoomin(zoom_speed)
-            sleep(dur)
+            packet = visca.ZOOM_IN[zoom_speed]
         elif zoom_command < 0:
-            self.ptz.zoomout(zoom_speed)
-            sleep(dur)
+            packet = visca.ZOOM_OUT[zoom_speed]
+        else:
+            packet = visca.ZOOM_STOP
+        self.scheduler.submit(PTZScheduler.ZOOM, packet)
 
         return zoom_speed
 
 
+class PTZCommand:
+    """VISCA command sent over TCP, followed until its completion reply."""
+
+    def __init__(self, packet):
+        self.packet = packet
+        self.socket = None  # assigned by the ACK
+        self.status = None  # 'completed' or 'error' once replied
+
+    @property
+    def done(self):
+        return self.status is not None
+
+
+class PTZMove:
+    """Absolute move started by `Camera.move_to`.
+
+    The move is settled once all its commands report completion, or once
+    the telemetry is within `tolerance` of the target, whichever is first.
+    """
+
+    def __init__(self, camera, commands, target, tolerance, timeout):
+        self.camera = camera
+        self.commands = commands
+        self.target = target
+        self.tolerance = tolerance
+        self.deadline = monotonic() + timeout
+        self.started = monotonic()
+        self.cancelled = False
+
+    @property
+    def expired(self):
+        return monotonic() > self.deadline
+
+    def settled(self):
+        if all(c.status == 'completed' for c in self.commands):
+            return True
+
+        sample = self.camera.cvreader.telemetry.latest()
+        if sample is None or sample[0] < self.started:
+            return False
+        to_signed = visca.to_signed
+        pan, tilt, zoom = self.target
+        return (abs(to_signed(sample[1]) - pan) <= self.tolerance and
+                abs(to_signed(sample[2]) - tilt) <= self.tolerance and
+                (zoom is None or abs(sample[3] - zoom) <= self.tolerance))
+
+    def wait(self, timeout=None):
+        """Blocks until the move settled. Returns False on timeout, once the
+        move expired or after it was cancelled."""
+        deadline = self.deadline if timeout is None else min(
+            self.deadline, monotonic() + timeout)
+        return self.camera.cvreader.telemetry.wait_for(
+            lambda: self.cancelled or self.settled(),
+            max(0, deadline - monotonic())) and not self.cancelled
+
+    def cancel(self):
+        """Stops the camera where it is."""
+        self.cancelled = True
+        self.camera.stop_motion()
+        self.camera.ptz.zoomstop()
+
+
+class PTZScheduler:
+    """Coalesces and rate limits continuous motion commands to the camera.
+
+    Pan and tilt share one drive packet, zoom has its own, so there are two
+    axes. A packet equal to the last one sent on its axis is suppressed, but
+    repeated after `refresh` seconds in case the UDP datagram was lost.
+    Packets arriving within `interval` of the last one sent on their axis are
+    held back and only the newest of them is sent once the interval passed,
+    by the next `submit` or else by a timer.
+    """
+    PAN_TILT = 'pan_tilt'
+    ZOOM = 'zoom'
+
+    def __init__(self, ptz, interval=1 / 30, refresh=0.5):
+        self.ptz = ptz
+        self.interval = interval
+        self.refresh = refresh
+
+        # counters
+        self.sent = 0
+        self.suppressed = 0
+
+        self.__last = {}  # axis -> (packet, time sent)
+        self.__pending = {}  # axis -> packet held back
+        self.__lock = Lock()
+
+    def submit(self, axis, packet, force=False):
+        """Queues `packet` for `axis`. Returns True if it was sent now."""
+        with self.__lock:
+            now = monotonic()
+            self.__flush(now, skip=axis)
+
+            if self.__pending.pop(axis, None) is not None:
+                self.suppressed += 1  # superseded before it was sent
+
+            last = self.__last.get(axis)
+            if not force and last is not None:
+                if packet == last[0] and now - last[1] < self.refresh:
+                    self.suppressed += 1
+                    return False
+                if now - last[1] < self.interval:
+                    if not self.__pending:
+                        self.__schedule_flush(self.interval - now + last[1])
+                    self.__pending[axis] = packet
+                    return False
+
+            self.__send(axis, packet, now)
+            return True
+
+    def flush(self):
+        """Sends held back packets whose interval has passed."""
+        with self.__lock:
+            self.__flush(monotonic())
+
+    def reset(self):
+        """Forgets sent and held packets, e.g. after a direct ptz command."""
+        with self.__lock:
+            self.suppressed += len(self.__pending)
+            self.__pending.clear()
+            self.__last.clear()
+
+    def counters(self):
+        return {
+            'sent': self.sent,
+            'suppressed': self.suppressed,
+            'pending': len(self.__pending)
+        }
+
+    def __flush(self, now, skip=None):
+        for axis, packet in list(self.__pending.items()):
+            if axis != skip and now - self.__last[axis][1] >= self.interval:
+                del self.__pending[axis]
+                self.__send(axis, packet, now)
+
+    def __schedule_flush(self, delay):
+        timer = Timer(delay, self.__flush_held)
+        timer.daemon = True
+        timer.start()
+
+    def __flush_held(self):
+        with self.__lock:
+            self.__flush(monotonic())
+            if self.__pending:  # superseded by a later send, wait again
+                self.__schedule_flush(self.interval)
+
+    def __send(self, axis, packet, now):
+        self.ptz.send(packet, 'udp')
+        self.__last[axis] = (packet, now)
+        self.sent += 1
+
+
+class SearchPlanner:
+    """Schedule of search poses covering a pan/tilt field of regard.
+
+    Poses form a serpentine grid over `pan_range` and `tilt_range` (signed
+    VISCA units). The next pose is the one unvisited for longest; poses
+    with a detection within `recent` seconds count `hot_factor` times as
+    stale and get the longer `hot_dwell`.
+    """
+
+    def __init__(self,
+                 pan_range=(0, 0),
+                 tilt_range=(0, 0),
+                 step=(2000, 400),
+                 dwell=5.0,
+                 hot_dwell=10.0,
+                 recent=60.0,
+                 hot_factor=4.0,
+                 speed=24,
+                 tolerance=16):
+        if pan_range[0] > pan_range[1] or tilt_range[0] > tilt_range[1]:
+            raise ValueError("Empty search range pan %s tilt %s" %
+                             (pan_range, tilt_range))
+        if step[0] <= 0 or step[1] <= 0:
+            raise ValueError("Search step must be positive, got %s" %
+                             (step, ))
+        pans = np.arange(pan_range[0], pan_range[1] + 1, step[0])
+        tilts = np.arange(tilt_range[0], tilt_range[1] + 1, step[1])
+        self.poses = [(int(pan), int(tilt))
+                      for i, tilt in enumerate(tilts)
+                      for pan in (pans if i % 2 == 0 else pans[::-1])]
+        self.dwell_time = dwell
+        self.hot_dwell = hot_dwell
+        self.recent = recent
+        self.hot_factor = hot_factor
+        self.speed = speed
+        self.tolerance = tolerance
+
+        self.index = None  # pose searched or moved to
+        self.move = None  # PTZMove to the pose until it is searched
+        self.last_visit = np.full(len(self.poses), -np.inf)
+        self.last_detection = np.full(len(self.poses), -np.inf)
+
+    @property
+    def target(self):
+        return self.poses[self.index]
+
+    def advance(self):
+        """Picks the next pose and returns it."""
+        now = monotonic()
+        hot = now - self.last_detection < self.recent
+        staleness = (now - self.last_visit) * np.where(hot, self.hot_factor,
+                                                        1)
+        if self.index is not None and len(self.poses) > 1:
+            staleness[self.index] = -np.inf
+
+        # ties, e.g. before every pose was visited, go along the sweep
+        start = 0 if self.index is None else self.index + 1
+        order = np.roll(np.arange(len(self.poses)), -start)
+        self.index = int(order[np.argmax(staleness[order])])
+        self.move = None
+        return self.target
+
+    def goto(self, camera):
+        """Moves `camera` to the current target at zoom 0."""
+        self.move = camera.move_to(*self.target, zoom=0, speed=self.speed,
+                                   tolerance=self.tolerance)
+        return self.move
+
+    def dwell(self):
+        """Marks the target visited and returns how long to search it."""
+        now = monotonic()
+        self.move = None
+        self.last_visit[self.index] = now
+        if now - self.last_detection[self.index] < self.recent:
+            return self.hot_dwell
+        return self.dwell_time
+
+    def record_detection(self, pan, tilt):
+        """Marks the pose closest to a detection at `pan`, `tilt` as hot."""
+        to_signed = visca.to_signed
+        distance = [
+            abs(to_signed(pan) - p) + abs(to_signed(tilt) - t)
+            for p, t in self.poses
+        ]
+        self.last_detection[int(np.argmin(distance))] = monotonic()
+
+
+class FrameRingBuffer:
+    """Ring of preallocated frames tagged with capture time and sequence number.
+
+    A single writer copies each frame into the next slot. Readers copy a slot
+    out and check its sequence number afterwards (seqlock), so no lock is held
+    while frames are copied. The condition only wakes up waiting readers.
+    """
+
+    def __init__(self, size=8, width=1920, height=1080, channels=3):
+        self.size = size
+        self.seq = -1  # sequence number of the most recent frame
+        self.__cond = Condition()
+        self.__allocate((height, width, channels))
+
+    def __allocate(self, shape):
+        self.frames = np.zeros((self.size, ) + shape, dtype=np.uint8)
+        self.stamps = np.zeros(self.size, dtype=np.float64)
+        self.seqs = np.full(self.size, -1, dtype=np.int64)
+
+    def write(self, frame, stamp=None):
+        """Copies `frame` into the next slot and wakes up waiting readers."""
+        if frame.shape != self.frames.shape[1:]:
+            self.__allocate(frame.shape)
+
+        seq = self.seq + 1
+        slot = seq % self.size
+        self.seqs[slot] = -1  # invalidate slot while it is overwritten
+        np.copyto(self.frames[slot], frame)
+        self.stamps[slot] = monotonic() if stamp is None else stamp
+        self.seqs[slot] = seq
+        self.seq = seq
+
+        with self.__cond:
+            self.__cond.notify_all()
+        return seq
+
+    def read(self, seq):
+        """Returns copy of frame `seq` and its stamp, None if overwritten."""
+        slot = seq % self.size
+        if seq < 0 or self.seqs[slot] != seq:
+            return None
+        frame = self.frames[slot].copy()
+        stamp = self.stamps[slot]
+        if self.seqs[slot] != seq:  # writer lapped us during the copy
+            return None
+        return frame, stamp
+
+    def latest(self):
+        """Returns (seq, stamp, frame) of the newest frame, None if empty."""
+        while self.seq >= 0:
+            seq = self.seq
+            item = self.read(seq)
+            if item is not None:
+                return seq, item[1], item[0]
+        return None
+
+    def wait_for_frame(self, after_seq=-1, timeout=None):
+        """Blocks until a frame newer than `after_seq` has been captured.
+
+        Returns (seq, stamp, frame) of the newest frame or None on timeout.
+        `seq - after_seq - 1` frames were skipped since `after_seq`.
+        """
+        with self.__cond:
+            if not self.__cond.wait_for(lambda: self.seq > after_seq,
+                                        timeout):
+                return None
+        return self.latest()
+
+    def nearest(self, stamp):
+        """Returns (seq, stamp, frame) of the buffered frame captured closest
+        to `stamp`, None if empty."""
+        while True:
+            seqs = self.seqs.copy()
+            valid = seqs >= 0
+            if not valid.any():
+                return None
+            diff = np.where(valid, np.abs(self.stamps - stamp), np.inf)
+            seq = int(seqs[np.argmin(diff)])
+            item = self.read(seq)
+            if item is not None:
+                return seq, item[1], item[0]
+
+
+class TelemetryHistory:
+    """Short history of timestamped pan, tilt and zoom samples.
+
+    Pan and tilt wrap around at 65535 (negative positions), so they are
+    interpolated as signed 16 bit values.
+    """
+
+    def __init__(self, size=64):
+        self.__stamps = deque(maxlen=size)
+        self.__poses = deque(maxlen=size)
+        self.__lock = Lock()
+        self.__cond = Condition()
+
+    def append(self, stamp, pan, tilt, zoom):
+        with self.__lock:
+            self.__stamps.append(stamp)
+            self.__poses.append(
+                (visca.to_signed(pan), visca.to_signed(tilt), zoom))
+        with self.__cond:
+            self.__cond.notify_all()
+
+    def wait_for(self, predicate, timeout=None):
+        """Evaluates `predicate` on every new sample until it is true.
+
+        Returns the last result of `predicate`, False on timeout.
+        """
+        with self.__cond:
+            return self.__cond.wait_for(predicate, timeout)
+
+    def latest(self):
+        """Returns (stamp, pan, tilt, zoom) of the newest sample or None."""
+        with self.__lock:
+            if not self.__stamps:
+                return None
+            pan, tilt, zoom = self.__poses[-1]
+            return self.__stamps[-1], pan % 65536, tilt % 65536, zoom
+
+    def pose_at(self, stamp):
+        """Returns (pan, tilt, zoom) linearly interpolated to `stamp`.
+
+        Stamps outside of the history are clamped to the oldest or newest
+        sample. Returns None if no sample has been recorded yet.
+        """
+        with self.__lock:
+            if not self.__stamps:
+                return None
+            i = bisect_left(self.__stamps, stamp)
+            if i == 0:
+                pose = self.__poses[0]
+            elif i == len(self.__stamps):
+                pose = self.__poses[-1]
+            else:
+                t0, t1 = self.__stamps[i - 1], self.__stamps[i]
+                p0, p1 = self.__poses[i - 1], self.__poses[i]
+                a = (stamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+                pose = [v0 + a * (v1 - v0) for v0, v1 in zip(p0, p1)]
+
+        pan, tilt, zoom = [int(round(v)) for v in pose]
+        return pan % 65536, tilt % 65536, zoom
+
+
 class CameraReaderAsync:
     class WeightedFramerateCounter:
         smoothing = 0.95
@@ -396,10 +903,16 @@ class CameraReaderAsync:
         def get_framerate(self):
             return self.framerate
 
-    def __init__(self, log_video, log_data, videoSource, ptz, log_fps=30.0):
-        # function pointers to log video frame and telemetry data
-        self.log_video = log_video
-        self.log_data = log_data
+    def __init__(self,
+                 log_frame,
+                 videoSource,
+                 ptz,
+                 log_fps=30.0,
+                 width=1920,
+                 height=1080,
+                 buffer_size=8):
+        # function pointer to queue video frame and telemetry data for logging
+        self.log_frame = log_frame
 
         # set framerate object
         self.fps = CameraReaderAsync.WeightedFramerateCounter()
@@ -408,14 +921,15 @@ class CameraReaderAsync:
         self.__source = videoSource
         self.__ptz = ptz
 
+        # captured frames and the last one handed out by read_frame
+        self.frames = FrameRingBuffer(buffer_size, width, height)
+        self.frame_seq = -1
+        self.frame_stamp = 0.0
+        self.dropped_frames = 0
+
         # variables
-        self.__lastFrameRead = False
         self.__last_time_logged = time()
-        self.__frame = None
-        self.__validFrame = False
-        self.__zoom = 0
-        self.__pan = 0
-        self.__tilt = 0
+        self.telemetry = TelemetryHistory()
         self.__log_fps = log_fps
 
         # exiting variables
@@ -423,10 +937,6 @@ class CameraReaderAsync:
         self.__telemetry_closed = False
         self.__frameread_closed = False
 
-        # initialize locks for telemetry and frame queries
-        self.__lock = Lock()
-        self.__telemetry_lock = Lock()
-
         # start telemetry and frame queries
         Thread(target=self.__ReadFrameAsync).start()
         Thread(target=self.__ReadTelemetryAsync).start()
@@ -434,7 +944,7 @@ class CameraReaderAsync:
     def __ReadFrameAsync(self):
         """
         Reads most recent frame from camera and updates local frameself.
-        Also updates gui, saves video frame, and logs data 
+        Also queues frame and telemetry for the logger thread
         """
         while True:
             if self.__stopRequested:
@@ -442,20 +952,16 @@ class CameraReaderAsync:
                 return
 
             validFrame, frame = self.__source.read()
-            if validFrame:
-                try:
-                    self.__lock.acquire()
-                    self.fps.tick()  # update frame rate
-                    self.__frame = frame  # update most recent frame
-                    self.__lastFrameRead = False
-                finally:
-                    self.__lock.release()
+            if not validFrame:
+                continue
+            stamp = monotonic()
+            self.fps.tick()  # update frame rate
+            self.frames.write(frame, stamp)
 
             # update gui, save frame to video, and post telemetry
             if (time() - self.__last_time_logged >= 1.0 / self.__log_fps):  # Cap at 30 FPS
                 self.__last_time_logged = time()
-                self.log_data()
-                self.log_video(self.__frame)
+                self.log_frame(frame, stamp)
 
     def __ReadTelemetryAsync(self):
         while True:
@@ -463,20 +969,13 @@ class CameraReaderAsync:
                 self.__telemetry_closed = True
                 return
 
-            validZoom, zoom = self.__ptz.get_zoom_position()
-            sleep(0.005)
-            validPT, pan, tilt = self.__ptz.get_pan_tilt_position()
+            start = monotonic()
+            valid, pan, tilt, zoom = self.__ptz.get_telemetry()
 
-            if validZoom and validPT:
-                try:
-                    #print("I'm putting telemetry in")
-                    self.__telemetry_lock.acquire()
-                    self.__zoom = zoom
-                    self.__pan = pan
-                    self.__tilt = tilt
-                finally:
-                    self.__telemetry_lock.release()
-            sleep(0.01)
+            # stamp sample with the middle of the inquiry round trip
+            if valid:
+                self.telemetry.append((start + monotonic()) / 2, pan, tilt,
+                                      zoom)
 
     def stop(self):
         self.__stopRequested = True
@@ -484,26 +983,35 @@ class CameraReaderAsync:
             sleep(0.1)
             continue
 
-    # Return a frame if we have a new frame since this was last called.
-    # If there is no frame or if the frame is not new, return None.
-    def read_frame(self):
-        try:
-            self.__lock.acquire()
-            if not self.__lastFrameRead:
-                frame = self.__frame
-                self.__lastFrameRead = True
-                return frame
-
+    # Return the newest frame if one arrived since this was last called,
+    # waiting up to `timeout` seconds for it. Otherwise return None.
+    def read_frame(self, timeout=0.1):
+        item = self.frames.wait_for_frame(self.frame_seq, timeout)
+        if item is None:
             return None
-        finally:
-            self.__lock.release()
 
-    def read_telemetry(self):
-        try:
-            self.__telemetry_lock.acquire()
-            return self.__pan, self.__tilt, self.__zoom
-        finally:
-            self.__telemetry_lock.release()
+        seq, stamp, frame = item
+        if self.frame_seq >= 0:
+            self.dropped_frames += seq - self.frame_seq - 1
+        self.frame_seq = seq
+        self.frame_stamp = stamp
+        return frame
+
+    def wait_for_frame(self, after_seq=-1, timeout=None):
+        return self.frames.wait_for_frame(after_seq, timeout)
+
+    def frame_nearest(self, stamp):
+        return self.frames.nearest(stamp)
+
+    # Return most recent (pan, tilt, zoom), or the pose interpolated to the
+    # monotonic `stamp` (e.g. a frame capture stamp) if given.
+    def read_telemetry(self, stamp=None):
+        if stamp is not None:
+            pose = self.telemetry.pose_at(stamp)
+            return pose if pose is not None else (0, 0, 0)
+
+        sample = self.telemetry.latest()
+        return sample[1:] if sample is not None else (0, 0, 0)
 
 
 class CameraIPInterface:
@@ -515,6 +1023,8 @@ class CameraIPInterface:
     _ptContinuousMotion = False
     # Continuous zoom change initiated
     _zContinuous = False
+    # Seconds an inquiry reply may still arrive after its inquiry timed out
+    LATE_REPLY_TIMEOUT = 1.0
 
     def __init__(self, host, tcp_port=5678, udp_port=1259):
         """Sony VISCA control class.
@@ -527,6 +1037,12 @@ class CameraIPInterface:
         self._host = host
         self._tcp_port = tcp_port
         self._udp_port = udp_port
+        self._rx = bytearray()  # received but not yet parsed tcp data
+        self._unacknowledged = deque()  # commands waiting for their ACK
+        self._sockets = {}  # socket number -> command running on it
+        self._commands_lock = Lock()
+        # (reply length, deadline) of inquiries given up waiting for
+        self._late = deque()
 
     def init(self):
         """Initializes camera object by connecting to TCP control socket.
@@ -536,6 +1052,7 @@ class CameraIPInterface:
         """
         print("Connecting to camera...")
         self._tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._tcp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self._udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._tcp_socket.settimeout(0.6)
         self._udp_socket.settimeout(0.6)
@@ -554,7 +1071,7 @@ class CameraIPInterface:
         self._udp_socket.settimeout(0.2)
 
         print("Camera controller initialized")
-        self.comm('8101043803FF', 'udp')  # Set focus to manual
+        self.send(visca.FOCUS_MANUAL, 'udp')  # Set focus to manual
 
         return self
 
@@ -572,36 +1089,160 @@ class CameraIPInterface:
         :return: Success.
         :rtype: bool
         """
-        if channel == "udp":
-            try:
-                self._udp_socket.send(binascii.unhexlify(com))
-                return True
-            except Exception as e:
-                print(com, e)
-                return False
-        if channel == "tcp":
-            try:
-                self._tcp_socket.send(binascii.unhexlify(com))
-                return True
-            except Exception as e:
-                print(com, e)
-                return False
+        return self.send(binascii.unhexlify(com), channel)
+
+    def send(self, packet, channel):
+        """Sends raw packet to the UDP or TCP control socket.
+
+        :param packet: Command packet.
+        :type packet: bytes
+        :return: Success.
+        :rtype: bool
+        """
+        sock = self._udp_socket if channel == "udp" else self._tcp_socket
+        try:
+            sock.send(packet)
+            return True
+        except Exception as e:
+            print(binascii.hexlify(packet), e)
+            return False
+
+    def read(self):
+        """Reads next reply packet from TCP control socket.
 
-    def read(self, amount=1):
-        total = ""
+        :return: Reply in hexadecimal format. Empty if nothing was received.
+        :rtype: str
+        """
+        packet = self._read_packet()
+        return binascii.hexlify(packet).decode() if packet else ""
+
+    def _read_packet(self):
+        """Returns next reply packet as bytes, None on timeout or error."""
         while True:
+            packet = visca.pop_packet(self._rx)
+            if packet is not None:
+                return packet
             try:
-                msg = binascii.hexlify(self._tcp_socket.recv(amount))
+                data = self._tcp_socket.recv(1024)
             except socket.timeout:
                 print("No data from camera socket")
-                break
+                return None
             except socket.error:
                 print("Camera socket read error.")
+                return None
+            if not data:
+                return None
+            self._rx += data
+
+    def inquire(self, *inquiries):
+        """Sends inquiries back-to-back over TCP and collects their replies.
+
+        Replies arrive in the order of the inquiries. Replies to TCP
+        commands are handed to `_command_reply`, including errors on socket
+        0, which belong to the oldest unacknowledged command if there is
+        one. Replies still due from inquiries that timed out are read
+        first, so they are not taken for those of the new ones.
+
+        :param inquiries: Inquiry packets from the visca module.
+        :return: Reply packet for each inquiry, None if it failed.
+        :rtype: list
+        """
+        self._drain_late()
+
+        replies = []
+        if not self.send(b''.join(inquiries), 'tcp'):
+            return [None] * len(inquiries)
+
+        while len(replies) < len(inquiries):
+            packet = self._read_packet()
+            if packet is None:
                 break
-            total = total + msg.decode("utf-8")
-            if total.endswith("ff"):
-                break
-        return total
+            reply = self._inquiry_reply(packet)
+            if reply is None:
+                continue
+            if reply is False:
+                replies.append(None)  # inquiries don't occupy a socket
+            elif len(reply) == visca.REPLY_LENGTH[inquiries[len(replies)]]:
+                replies.append(reply)
+
+        # their replies may still come, up to LATE_REPLY_TIMEOUT from now
+        deadline = monotonic() + self.LATE_REPLY_TIMEOUT
+        self._late.extend((visca.REPLY_LENGTH[i], deadline)
+                          for i in inquiries[len(replies):])
+        return replies + [None] * (len(inquiries) - len(replies))
+
+    def _drain_late(self):
+        """Reads the replies still due from inquiries that timed out.
+
+        A reply of another length than the next one due means that one was
+        lost. Replies not in by their deadline are given up on.
+        """
+        while self._late:
+            if monotonic() > self._late[-1][1]:
+                self._late.clear()
+                return
+            packet = self._read_packet()
+            if packet is None:
+                continue
+            reply = self._inquiry_reply(packet)
+            if reply is None:
+                continue
+            if reply is not False:
+                while self._late and self._late[0][0] != len(reply):
+                    self._late.popleft()
+            if self._late:
+                self._late.popleft()
+
+    def _inquiry_reply(self, packet):
+        """Returns `packet` if it is an inquiry reply, False if it is an error
+        answering an inquiry and None if it was a command reply."""
+        if len(packet) < 3:
+            return None
+        kind, sock = visca.reply_type(packet), visca.reply_socket(packet)
+        if kind == visca.COMPLETION and sock == 0 and len(packet) > 3:
+            return packet
+        if not self._command_reply(packet) and kind == visca.ERROR:
+            return False
+        return None
+
+    def command(self, packet):
+        """Sends `packet` over TCP and returns it as `PTZCommand`.
+
+        Its ACK and completion are picked up by the telemetry inquiries,
+        which read every reply on the TCP socket.
+        """
+        command = PTZCommand(packet)
+        with self._commands_lock:
+            self._unacknowledged.append(command)
+        if not self.send(packet, 'tcp'):
+            with self._commands_lock:
+                self._unacknowledged.remove(command)
+            command.status = 'error'
+        return command
+
+    def _command_reply(self, packet):
+        """Matches ACK, completion and error replies to sent commands.
+
+        ACKs arrive in the order the commands were sent and name the socket
+        the command runs on, later replies of the command carry it too. An
+        error on socket 0, e.g. syntax error or buffer full, rejects the
+        oldest unacknowledged command. Returns False if no command matched.
+        """
+        kind, sock = visca.reply_type(packet), visca.reply_socket(packet)
+        with self._commands_lock:
+            if kind == visca.ACK and self._unacknowledged:
+                command = self._unacknowledged.popleft()
+                command.socket = sock
+                self._sockets[sock] = command
+            elif kind == visca.ERROR and sock == 0 and self._unacknowledged:
+                self._unacknowledged.popleft().status = 'error'
+            elif kind == visca.COMPLETION and sock in self._sockets:
+                self._sockets.pop(sock).status = 'completed'
+            elif kind == visca.ERROR and sock in self._sockets:
+                self._sockets.pop(sock).status = 'error'
+            else:
+                return False
+        return True
 
     def end(self):
         self._tcp_socket.close()
@@ -629,14 +1270,9 @@ class CameraIPInterface:
         :return: Zoom distance
         :rtype: int
         """
-        self.comm('81090447FF', 'tcp')
-        msg = self.read()[4:-2]
-        r = ""
-        if len(msg) == 8:
-            for x in range(1, 9, 2):
-                r += msg[x]
-            x = int(r, 16)
-            return True, x
+        reply, = self.inquire(visca.ZOOM_INQUIRY)
+        if reply is not None:
+            return True, visca.decode_zoom(reply)
         return False, -1
 
     def get_pan_tilt_position(self):
@@ -651,20 +1287,24 @@ class CameraIPInterface:
         :return: tilt position
         :rtype: int
         """
-        self.comm('81090612FF', 'tcp')
-        msg = self.read()[4:-2]
-        r = ""
-        if len(msg) == 16:
-            for x in range(1, 9, 2):
-                r += msg[x]
-            pan = int(r, 16)
-            r = ""
-            for x in range(9, 17, 2):
-                r += msg[x]
-            tilt = int(r, 16)
-            return True, pan, tilt
+        reply, = self.inquire(visca.PAN_TILT_INQUIRY)
+        if reply is not None:
+            return (True, ) + visca.decode_pan_tilt(reply)
         return False, -1, -1
 
+    def get_telemetry(self):
+        """Retrieves pan/tilt and zoom position with pipelined inquiries.
+
+        :return: Success, pan, tilt and zoom position
+        :rtype: tuple
+        """
+        zoom_reply, pt_reply = self.inquire(visca.ZOOM_INQUIRY,
+                                            visca.PAN_TILT_INQUIRY)
+        if zoom_reply is None or pt_reply is None:
+            return False, -1, -1, -1
+        pan, tilt = visca.decode_pan_tilt(pt_reply)
+        return True, pan, tilt, visca.decode_zoom(zoom_reply)
+
     def home(self):
         """Moves camera to home position.
 
@@ -673,7 +1313,7 @@ class CameraIPInterface:
         """
         # Since home is not continuing motion, we'll call it a stop
         self._ptContinuousMotion = False
-        return self.comm('81010604FF', 'udp')
+        return self.send(visca.HOME, 'udp')
 
     def reset(self):
         """Resets camera.
@@ -683,7 +1323,7 @@ class CameraIPInterface:
         """
         self._ptContinuousMotion = False
         self._zContinuous = False
-        return self.comm('81010605FF', 'udp')
+        return self.send(visca.RESET, 'udp')
 
     def stop(self):
         """Stops camera movement (pan/tilt).
@@ -692,7 +1332,7 @@ class CameraIPInterface:
         :rtype: bool
         """
         self._ptContinuousMotion = False
-        return self.comm('8101060115150303FF', 'udp')
+        return self.send(visca.STOP, 'udp')
 
     def cancel(self):
         """Cancels current command.
@@ -702,16 +1342,11 @@ class CameraIPInterface:
         """
         self._ptContinuousMotion = False
         self._zContinuous = False
-        return self.comm('81010001FF', 'udp')
-
-    def _move(self, string, a1, a2):
-        h1 = "%X" % a1
-        h1 = '0' + h1 if len(h1) < 2 else h1
+        return self.send(visca.CANCEL, 'udp')
 
-        h2 = "%X" % a2
-        h2 = '0' + h2 if len(h2) < 2 else h2
+    def _drive(self, direction, pan_speed, tilt_speed):
         self._ptContinuousMotion = True
-        return self.comm(string.replace('VV', h1).replace('WW', h2), 'udp')
+        return self.send(visca.drive(direction, pan_speed, tilt_speed), 'udp')
 
     def goto(self, pan, tilt, speed=5):
         """Moves camera to absolute pan and tilt coordinates.
@@ -722,27 +1357,10 @@ class CameraIPInterface:
         :return: True if successful, False if not.
         :rtype: bool
         """
-        speed_hex = "%X" % speed
-        speed_hex = '0' + speed_hex if len(speed_hex) < 2 else speed_hex
-
-        pan_hex = "%X" % pan
-        pan_hex = pan_hex if len(pan_hex) > 3 else (
-            "0" * (4 - len(pan_hex))) + pan_hex
-        pan_hex = "0" + "0".join(pan_hex)
-
-        tilt_hex = "%X" % tilt
-        tilt_hex = tilt_hex if len(tilt_hex) > 3 else (
-            "0" * (4 - len(tilt_hex))) + tilt_hex
-        tilt_hex = "0" + "0".join(tilt_hex)
-
-        s = '81010602VVWWYYYYZZZZFF'.replace('VV', speed_hex).replace(
-            'WW', speed_hex).replace('YYYY',
-                                     pan_hex).replace('ZZZZ', tilt_hex)
-
         # Not in continuing motion
         self._ptContinuousMotion = False
 
-        return self.comm(s, 'udp')
+        return self.send(visca.encode_position(0x02, pan, tilt, speed), 'udp')
 
     def gotoIncremental(self, pan, tilt, speed=5):
         """Moves camera to relative pan and tilt coordinates.
@@ -753,27 +1371,10 @@ class CameraIPInterface:
         :return: True if successful, False if not.
         :rtype: bool
         """
-        speed_hex = "%X" % speed
-        speed_hex = '0' + speed_hex if len(speed_hex) < 2 else speed_hex
-
-        pan_hex = "%X" % pan
-        pan_hex = pan_hex if len(pan_hex) > 3 else (
-            "0" * (4 - len(pan_hex))) + pan_hex
-        pan_hex = "0" + "0".join(pan_hex)
-
-        tilt_hex = "%X" % tilt
-        tilt_hex = tilt_hex if len(tilt_hex) > 3 else (
-            "0" * (4 - len(tilt_hex))) + tilt_hex
-        tilt_hex = "0" + "0".join(tilt_hex)
-
-        s = '81010603VVWWYYYYZZZZFF'.replace('VV', speed_hex).replace(
-            'WW', speed_hex).replace('YYYY',
-                                     pan_hex).replace('ZZZZ', tilt_hex)
-
         # Not in continuing motion
         self._ptContinuousMotion = False
 
-        return self.comm(s, 'udp')
+        return self.send(visca.encode_position(0x03, pan, tilt, speed), 'udp')
 
     def zoomstop(self):
         """Halt the zoom motor
@@ -781,9 +1382,8 @@ class CameraIPInterface:
         :return: True on success, False on failure
         :rtype: bool
         """
-        s = '8101040700FF'
         self._zContinuous = False
-        return self.comm(s, 'udp')
+        return self.send(visca.ZOOM_STOP, 'udp')
 
     def zoomin(self, speed=0):
         """Initiate tele zoom at speed range 0-7
@@ -794,10 +1394,8 @@ class CameraIPInterface:
         """
         if speed < 0 or speed > 7:
             return False
-        s = '810104072pFF'.replace('p', "{0:1s}".format(str(speed)))
-        # print("zoomin comm string: " + s)
         self._zContinuous = True
-        return self.comm(s, 'udp')
+        return self.send(visca.ZOOM_IN[speed], 'udp')
 
     def zoomout(self, speed=0):
         """Initiate tele zoom at speed range 0-7
@@ -808,10 +1406,8 @@ class CameraIPInterface:
         """
         if speed < 0 or speed > 7:
             return False
-        s = '810104073pFF'.replace('p', "{0:1s}".format(str(speed)))
-        # print("zoomout comm string: " + s)
         self._zContinuous = True
-        return self.comm(s, 'udp')
+        return self.send(visca.ZOOM_OUT[speed], 'udp')
 
     def zoomto(self, zoom, channel='udp'):
         """Moves camera to absolute zoom setting.
@@ -820,13 +1416,7 @@ class CameraIPInterface:
         :return: True if successful, False if not.
         :rtype: bool
         """
-        zoom_hex = "%X" % zoom
-        zoom_hex = zoom_hex if len(zoom_hex) > 3 else (
-            "0" * (4 - len(zoom_hex))) + zoom_hex
-        zoom_hex = "0" + "0".join(zoom_hex)
-
-        s = '81010447pqrsFF'.replace('pqrs', zoom_hex)
-        return self.comm(s, channel)
+        return self.send(visca.encode_zoom_position(zoom), channel)
 
     def left(self, amount=5):
         """Modifies pan speed to left.
@@ -835,12 +1425,7 @@ class CameraIPInterface:
         :return: True if successful, False if not.
         :rtype: bool
         """
-        hex_string = "%X" % amount
-        hex_string = '0' + hex_string if len(hex_string) < 2 else hex_string
-        s = '81010601VVWW0103FF'.replace('VV',
-                                         hex_string).replace('WW', str(15))
-        self._ptContinuousMotion = True
-        return self.comm(s, 'udp')
+        return self._drive('left', amount, visca.IDLE_SPEED)
 
     def right(self, amount=5):
         """Modifies pan speed to right.
@@ -848,12 +1433,7 @@ class CameraIPInterface:
         :param amount: Speed (0-24)
         :return: True if successful, False if not.
         """
-        hex_string = "%X" % amount
-        hex_string = '0' + hex_string if len(hex_string) < 2 else hex_string
-        s = '81010601VVWW0203FF'.replace('VV',
-                                         hex_string).replace('WW', str(15))
-        self._ptContinuousMotion = True
-        return self.comm(s, 'udp')
+        return self._drive('right', amount, visca.IDLE_SPEED)
 
     def up(self, amount=5):
         """Modifies tilt speed to up.
@@ -861,11 +1441,7 @@ class CameraIPInterface:
         :param amount: Speed (0-24)
         :return: True if successful, False if not.
         """
-        hs = "%X" % amount
-        hs = '0' + hs if len(hs) < 2 else hs
-        s = '81010601VVWW0301FF'.replace('VV', str(15)).replace('WW', hs)
-        self._ptContinuousMotion = True
-        return self.comm(s, 'udp')
+        return self._drive('up', visca.IDLE_SPEED, amount)
 
     def down(self, amount=5):
         """Modifies tilt to down.
@@ -873,23 +1449,19 @@ class CameraIPInterface:
         :param amount: Speed (0-24)
         :return: True if successful, False if not.
         """
-        hs = "%X" % amount
-        hs = '0' + hs if len(hs) < 2 else hs
-        s = '81010601VVWW0302FF'.replace('VV', str(15)).replace('WW', hs)
-        self._ptContinuousMotion = True
-        return self.comm(s, 'udp')
+        return self._drive('down', visca.IDLE_SPEED, amount)
 
     def left_up(self, pan, tilt):
-        return self._move('81010601VVWW0101FF', pan, tilt)
+        return self._drive('left_up', pan, tilt)
 
     def right_up(self, pan, tilt):
-        return self._move('81010601VVWW0201FF', pan, tilt)
+        return self._drive('right_up', pan, tilt)
 
     def left_down(self, pan, tilt):
-        return self._move('81010601VVWW0102FF', pan, tilt)
+        return self._drive('left_down', pan, tilt)
 
     def right_down(self, pan, tilt):
-        return self._move('81010601VVWW0202FF', pan, tilt)
+        return self._drive('right_down', pan, tilt)
 
 
 class PIDController:
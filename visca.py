@@ -0,0 +1,125 @@
+"Byte level helpers for the VISCA protocol spoken by the PTZOptics camera"
+
+TERMINATOR = 0xFF
+
+# Reply types, high nibble of the second byte of a camera reply
+ACK = 0x40
+COMPLETION = 0x50
+ERROR = 0x60
+
+# Inquiries and the length of their completion reply
+ZOOM_INQUIRY = b'\x81\x09\x04\x47\xff'
+PAN_TILT_INQUIRY = b'\x81\x09\x06\x12\xff'
+REPLY_LENGTH = {ZOOM_INQUIRY: 7, PAN_TILT_INQUIRY: 11}
+
+
+def pop_packet(buf):
+    """Removes the first complete packet from bytearray `buf` and returns it.
+
+    Returns None if `buf` holds no terminated packet yet.
+    """
+    end = buf.find(TERMINATOR)
+    if end < 0:
+        return None
+    packet = bytes(buf[:end + 1])
+    del buf[:end + 1]
+    return packet
+
+
+def reply_type(packet):
+    return packet[1] & 0xF0
+
+
+def reply_socket(packet):
+    return packet[1] & 0x0F
+
+
+def to_signed(val):
+    """Returns 16 bit position `val` as signed, left and down of home are
+    negative."""
+    return val - 65536 if val >= 32768 else val
+
+
+def decode_nibbles(payload):
+    """Returns integer packed into the low nibbles of `payload` (0p 0q ..)."""
+    val = 0
+    for byte in payload:
+        val = (val << 4) | (byte & 0x0F)
+    return val
+
+
+def decode_zoom(packet):
+    """Returns zoom position from reply `90 50 0p 0q 0r 0s FF`."""
+    return decode_nibbles(packet[2:6])
+
+
+def decode_pan_tilt(packet):
+    """Returns pan and tilt from reply `90 50 0p 0q 0r 0s 0t 0u 0v 0w FF`."""
+    return decode_nibbles(packet[2:6]), decode_nibbles(packet[6:10])
+
+
+# Commands without parameters
+HOME = b'\x81\x01\x06\x04\xff'
+RESET = b'\x81\x01\x06\x05\xff'
+CANCEL = b'\x81\x01\x00\x01\xff'
+FOCUS_MANUAL = b'\x81\x01\x04\x38\x03\xff'
+ZOOM_STOP = b'\x81\x01\x04\x07\x00\xff'
+
+# Pan and tilt direction bytes of the drive command per direction
+DRIVE_DIRECTIONS = {
+    'left': (0x01, 0x03),
+    'right': (0x02, 0x03),
+    'up': (0x03, 0x01),
+    'down': (0x03, 0x02),
+    'left_up': (0x01, 0x01),
+    'right_up': (0x02, 0x01),
+    'left_down': (0x01, 0x02),
+    'right_down': (0x02, 0x02),
+    'stop': (0x03, 0x03),
+}
+MAX_PAN_SPEED = 0x18
+MAX_TILT_SPEED = 0x14
+IDLE_SPEED = 0x15  # speed sent for the axis that is not driven
+MAX_ZOOM_SPEED = 7
+
+
+def nibbles(val, count=4):
+    """Returns `val` split into `count` bytes holding one nibble each."""
+    return bytes((val >> shift) & 0x0F
+                 for shift in range(4 * (count - 1), -1, -4))
+
+
+def encode_drive(direction, pan_speed, tilt_speed):
+    pan_dir, tilt_dir = DRIVE_DIRECTIONS[direction]
+    return bytes((0x81, 0x01, 0x06, 0x01, pan_speed, tilt_speed, pan_dir,
+                  tilt_dir, 0xFF))
+
+
+def encode_position(cmd, pan, tilt, speed):
+    """Absolute (cmd 0x02) or relative (cmd 0x03) pan/tilt position."""
+    return (bytes((0x81, 0x01, 0x06, cmd, speed, speed)) +
+            nibbles(pan & 0xFFFF) + nibbles(tilt & 0xFFFF) + b'\xff')
+
+
+def encode_zoom_position(zoom):
+    return b'\x81\x01\x04\x47' + nibbles(zoom & 0xFFFF) + b'\xff'
+
+
+# Every drive and zoom packet the controllers can emit, built at import
+DRIVE = {(direction, pan, tilt): encode_drive(direction, pan, tilt)
+         for direction in DRIVE_DIRECTIONS
+         for pan in range(MAX_PAN_SPEED + 1)
+         for tilt in range(IDLE_SPEED + 1)}
+ZOOM_IN = [bytes((0x81, 0x01, 0x04, 0x07, 0x20 | speed, 0xFF))
+           for speed in range(MAX_ZOOM_SPEED + 1)]
+ZOOM_OUT = [bytes((0x81, 0x01, 0x04, 0x07, 0x30 | speed, 0xFF))
+            for speed in range(MAX_ZOOM_SPEED + 1)]
+STOP = DRIVE['stop', IDLE_SPEED, IDLE_SPEED]
+
+
+def drive(direction, pan_speed, tilt_speed):
+    """Returns drive packet, from the table unless speeds are out of range."""
+    packet = DRIVE.get((direction, pan_speed, tilt_speed))
+    if packet is None:
+        packet = encode_drive(direction, pan_speed & 0xFF, tilt_speed & 0xFF)
+    return packet